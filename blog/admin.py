@@ -1,21 +1,114 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.utils import model_ngettext
+from django.utils.translation import gettext_lazy as _
 
 from .forms import BlogCreationForm, BlogChangeForm, CommentCreationForm, CommentChangeForm
+from .likes import forget_liked_posts
 from .models import Post, Comment, Like
+from .moderation import moderate_comments, moderate_posts
+from .pagination import EstimatedCountPaginator
+from .search import search_comment_ids, search_post_ids
 
 
-class PostAdmin(admin.ModelAdmin):
+class BlogModelAdmin(admin.ModelAdmin):
+    """Administration of the blog tables, which may grow large.
+
+    The changelists estimate the size of the unfiltered tables rather than
+    counting them, and are ordered on the primary key, which follows the order
+    of creation.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+
+
+class IndexSearchMixin(object):
+    """Search the objects matched by the full-text index, or by the exact
+    slugs of the search_fields.
+
+    The index is looked up by ``search_index``, returning the identifiers of the
+    matching objects for ``search_index_lookup``, those of their posts by
+    default.
+    """
+
+    search_index = staticmethod(search_post_ids)
+    search_index_lookup = 'post__in'
+
+    def get_search_results(self, request, queryset, search_term):
+        slug_queryset, use_distinct = super(IndexSearchMixin, self).get_search_results(request, queryset, search_term)
+        if search_term:
+            matches = queryset.filter(**{self.search_index_lookup: self.search_index(search_term)})
+            return matches | slug_queryset, use_distinct
+        return slug_queryset, use_distinct
+
+
+class PostColumnsMixin(object):
+    """Leave the bodies of the posts, joined to name them, out of the
+    changelists."""
+
+    def get_queryset(self, request):
+        return super(PostColumnsMixin, self).get_queryset(request).defer('post__content', 'post__content_html')
+
+
+class ModerationMixin(object):
+    """Actions moderating the selected objects in chunks of set-based
+    statements, the deletions included."""
+
+    moderation = None
+
+    def moderate(self, request, queryset, action, message):
+        moderated = 0
+        for moderated in self.moderation(queryset, action):
+            pass
+        if message is not None:
+            self.message_user(request, message % {
+                'count': moderated, 'items': model_ngettext(self.opts, moderated),
+            }, messages.SUCCESS)
+
+    def publish_selected(self, request, queryset):
+        self.moderate(request, queryset, 'publish', _('Successfully published %(count)d %(items)s.'))
+
+    publish_selected.short_description = _('Publish selected %(verbose_name_plural)s')
+
+    def draft_selected(self, request, queryset):
+        self.moderate(request, queryset, 'draft', _('Successfully drafted %(count)d %(items)s.'))
+
+    draft_selected.short_description = _('Draft selected %(verbose_name_plural)s')
+
+    def hide_selected(self, request, queryset):
+        self.moderate(request, queryset, 'hide', _('Successfully hid %(count)d %(items)s.'))
+
+    hide_selected.short_description = _('Show selected %(verbose_name_plural)s to authenticated users only')
+
+    def show_selected(self, request, queryset):
+        self.moderate(request, queryset, 'show', _('Successfully showed %(count)d %(items)s.'))
+
+    show_selected.short_description = _('Show selected %(verbose_name_plural)s to everybody')
+
+    def delete_queryset(self, request, queryset):
+        # The confirmed deletions of the selected objects are reported by the
+        # delete_selected action itself.
+        self.moderate(request, queryset, 'delete', None)
+
+
+class PostAdmin(IndexSearchMixin, ModerationMixin, BlogModelAdmin):
     """Administration for blog posts."""
 
     add_form = BlogCreationForm
     form = BlogChangeForm
 
-    list_display = ('title', 'author', 'visibility', 'status', 'created_on',)
+    list_display = ('title', 'author', 'visibility', 'status', 'like_count', 'comment_count', 'created_on',)
+    list_select_related = ('author',)
     list_filter = ('visibility', 'status',)
-    search_fields = ('title', 'content', 'slug',)
-    ordering = ('created_on',)
+    # The exact slugs are looked up by the admin, the words through the
+    # full-text index.
+    search_fields = ('=slug',)
+    search_index_lookup = 'pk__in'
     filter_horizontal = ()
-    readonly_fields = ('slug', 'author', 'created_on', 'updated_on')
+    readonly_fields = ('slug', 'author', 'like_count', 'comment_count', 'created_on', 'updated_on')
+    actions = ('publish_selected', 'draft_selected', 'hide_selected', 'show_selected')
+    moderation = staticmethod(moderate_posts)
 
     def save_model(self, request, obj, form, change):
         if not obj.pk:
@@ -24,24 +117,31 @@ class PostAdmin(admin.ModelAdmin):
         super(PostAdmin, self).save_model(request, obj, form, change)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexSearchMixin, PostColumnsMixin, ModerationMixin, BlogModelAdmin):
     """Administration for blog comments."""
 
     add_form = CommentCreationForm
     form = CommentChangeForm
 
     list_display = ('post', 'author', 'status', 'created_on',)
+    list_select_related = ('post', 'author')
     list_filter = ('status',)
+    # The comments of a post are looked up by its exact slug, the words of the
+    # comments, drafts included, through the full-text index.
+    search_fields = ('=post__slug',)
+    search_index = staticmethod(search_comment_ids)
+    search_index_lookup = 'pk__in'
+    raw_id_fields = ('post',)
     add_fieldsets = (
         (None, {'classes': ('wide',), 'fields': ('post', 'content', 'status')}),
     )
     fieldsets = (
         (None, {'fields': ('post', 'content', 'status')}),
     )
-    search_fields = ('post', 'content',)
-    ordering = ('created_on',)
     filter_horizontal = ()
     readonly_fields = ('author', 'created_on', 'updated_on')
+    actions = ('publish_selected', 'draft_selected')
+    moderation = staticmethod(moderate_comments)
 
     def save_model(self, request, obj, form, change):
         if not obj.pk:
@@ -50,24 +150,38 @@ class CommentAdmin(admin.ModelAdmin):
         super(CommentAdmin, self).save_model(request, obj, form, change)
 
 
-class LikeAdmin(admin.ModelAdmin):
+class LikeAdmin(IndexSearchMixin, PostColumnsMixin, BlogModelAdmin):
     """Administration for blog likes."""
 
-    list_display = ('post', 'created_on',)
+    list_display = ('post', 'user', 'created_on',)
+    list_select_related = ('post', 'user')
     list_filter = ()
+    search_fields = ('=post__slug',)
+    raw_id_fields = ('post', 'user')
     add_fieldsets = (
-        (None, {'classes': ('wide',), 'fields': ('post', 'authors')}),
+        (None, {'classes': ('wide',), 'fields': ('post', 'user')}),
     )
-    search_fields = ('post',)
-    ordering = ('created_on',)
+    fields = ('post', 'user')
     filter_horizontal = ()
-    readonly_fields = ('created_on', 'updated_on')
+    readonly_fields = ('created_on',)
 
     def save_model(self, request, obj, form, change):
-        if not obj.pk:
-            # The author should be added only at the first saving.
-            obj.author = request.user
         super(LikeAdmin, self).save_model(request, obj, form, change)
+        # The like counters of the previous and new posts are recomputed, as
+        # well as the liked posts of the previous and new users.
+        Post.objects.filter(pk__in={obj.post_id, form.initial.get('post')}).reconcile_counters()
+        forget_liked_posts({obj.user_id, form.initial.get('user')} - {None})
+
+    def delete_model(self, request, obj):
+        super(LikeAdmin, self).delete_model(request, obj)
+        Post.objects.filter(pk=obj.post_id).reconcile_counters()
+        forget_liked_posts([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        likes = list(queryset.values_list('post_id', 'user_id'))
+        super(LikeAdmin, self).delete_queryset(request, queryset)
+        Post.objects.filter(pk__in={post_id for post_id, _ in likes}).reconcile_counters()
+        forget_liked_posts({user_id for _, user_id in likes})
 
 
 admin.site.register(Post, PostAdmin)
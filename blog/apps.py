@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BlogConfig(AppConfig):
     name = 'blog'
+
+    def ready(self):
+        # Connect the signal receivers of the blog.
+        from . import signals  # noqa: F401
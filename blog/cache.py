@@ -0,0 +1,188 @@
+"""
+Page validators and page cache of the blog.
+
+The validators of the pages are derived from the rows they show, so that every
+process agrees on them: the details page of a post from the post and its
+comments, and each page of the post list from its posts. The ETag is a
+fingerprint of these rows, and the Last-Modified header of the details pages
+the latest update among them. The posts are touched whenever their pages change
+without their row changing, such as when their counters change, a comment is
+deleted or an author is renamed, see PostQuerySet.touch.
+
+The conditional requests are thus answered with a 304 after a single cheap
+query, without rendering anything.
+
+The fingerprints also key the opt-in page cache of the anonymous readers
+(BLOG_PAGE_CACHE), the stale entries being orphaned rather than deleted. On a
+miss, a single request rebuilds the page while the concurrent ones wait for it,
+for BLOG_PAGE_CACHE_WAIT_TIMEOUT seconds at most, before rendering the page
+themselves without storing it.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .pagination import InvalidCursor
+
+PAGE_CACHE = getattr(settings, 'BLOG_PAGE_CACHE', False)
+PAGE_CACHE_ALIAS = getattr(settings, 'BLOG_PAGE_CACHE_ALIAS', 'default')
+PAGE_CACHE_TIMEOUT = getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 5 * 60)
+PAGE_CACHE_LOCK_TIMEOUT = getattr(settings, 'BLOG_PAGE_CACHE_LOCK_TIMEOUT', 10)
+PAGE_CACHE_WAIT_TIMEOUT = getattr(settings, 'BLOG_PAGE_CACHE_WAIT_TIMEOUT', 1)
+PAGE_CACHE_POLL_INTERVAL = 0.05
+
+
+def fingerprint(*values):
+    return hashlib.md5(json.dumps(values, default=str).encode()).hexdigest()
+
+
+def page_cache_key(etag, path):
+    """Return the key of the cached page of ``path`` with the ``etag``."""
+    return 'blog:pages:{}:{}'.format(etag, hashlib.md5(path.encode()).hexdigest())
+
+
+class CachedPageMixin(object):
+    """Answer the conditional GET requests from the page validators, and
+    serve the anonymous users from the page cache.
+
+    The views define get_page_state, returning the values the validators of
+    the page requested are derived from and its last modification time, if
+    known, or None if the page is not found.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+
+        state = self.get_page_state()
+        if state is None:
+            return super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+
+        values, last_modified = state
+        etag = fingerprint(values, self.get_page_variant())
+        if last_modified is not None:
+            last_modified = int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+        if response is None:
+            response = self.get_page(etag, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = quote_etag(etag)
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            self.patch_page_headers(response)
+
+        return response
+
+    def get_page(self, etag, request, *args, **kwargs):
+        if not PAGE_CACHE or request.user.is_authenticated:
+            return super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+
+        cache = caches[PAGE_CACHE_ALIAS]
+        key = page_cache_key(etag, request.get_full_path())
+        page = cache.get(key)
+        if page is not None:
+            return self.page_response(page)
+
+        # Only the request holding the lock renders and stores the page, the
+        # others wait for it to be stored, or render it themselves if it takes
+        # too long, such as when the holder of the lock died.
+        lock_key = '{}:lock'.format(key)
+        locked = cache.add(lock_key, True, PAGE_CACHE_LOCK_TIMEOUT)
+        if not locked:
+            page = self.wait_for_page(cache, key)
+            if page is not None:
+                return self.page_response(page)
+            return super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+
+        try:
+            response = super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            if response.status_code == 200 and not response.cookies:
+                cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+
+        return response
+
+    def wait_for_page(self, cache, key):
+        deadline = time.monotonic() + PAGE_CACHE_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(PAGE_CACHE_POLL_INTERVAL)
+            page = cache.get(key)
+            if page is not None:
+                return page
+        return None
+
+    def page_response(self, page):
+        content, content_type = page
+        return HttpResponse(content, content_type=content_type)
+
+    def get_page_variant(self):
+        # The pages of the authenticated users depend on who they are and on
+        # the posts they liked, pending likes included.
+        from .likes import liked_posts
+
+        user = self.request.user
+        if not user.is_authenticated:
+            return 'anonymous'
+        return '{}:{}'.format(user.pk, hashlib.md5(liked_posts(user).tobytes()).hexdigest())
+
+    def patch_page_headers(self, response):
+        # The pages may be stored, but must always be revalidated since they
+        # change with every like. Only the anonymous pages can be stored by
+        # shared caches.
+        if self.request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+
+    def get_page_state(self):
+        raise NotImplementedError('subclasses of CachedPageMixin must provide a get_page_state() method')
+
+
+class PostListCacheMixin(CachedPageMixin):
+    """Cached pages of the post list."""
+
+    def get_page_state(self):
+        # The page is located again with only the keys and update times of its
+        # posts, which change along with anything the page shows. A deleted post
+        # leaves no trace in the update times of the others, hence the list
+        # pages have no Last-Modified header.
+        queryset = self.get_queryset().select_related(None).only('created_on', 'updated_on')
+        paginator = self.get_paginator(queryset, self.get_paginate_by(queryset))
+        try:
+            page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            return None
+
+        return [[post.pk, post.updated_on] for post in page] + [page.has_next(), page.has_previous()], None
+
+
+class PostDetailCacheMixin(CachedPageMixin):
+    """Cached pages of the details of a post."""
+
+    def get_page_state(self):
+        # The comments are summed up through their (post, updated_on) index,
+        # their count accounting for the deleted ones.
+        from .models import Comment
+
+        comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post')
+        try:
+            state = self.get_queryset().filter(slug=self.kwargs.get(self.slug_url_kwarg)).annotate(
+                comments_updated_on=Subquery(comments.annotate(last=Max('updated_on')).values('last')),
+                comments_total=Subquery(comments.annotate(total=Count('pk')).values('total')),
+            ).values_list('pk', 'updated_on', 'comments_updated_on', 'comments_total').get()
+        except self.model.DoesNotExist:
+            return None
+
+        _, updated_on, comments_updated_on, _ = state
+        return state, max(updated_on, comments_updated_on or updated_on)
@@ -0,0 +1,126 @@
+"""
+Static snapshot of the public blog.
+
+The list pages and the details pages of the published posts visible to
+everybody are rendered into files laid out as their URLs, for the web server to
+serve them to the anonymous readers without going through Django. The list
+pages are numbered rather than located by cursors, under ``page/<number>/``.
+
+A manifest stored along with the files keeps a fingerprint of each rendered
+post and list page, so that the next exports only render the posts whose
+content, comments or likes changed, and the list pages holding them.
+"""
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Max, Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .cache import fingerprint
+from .likes import LikedPosts
+from .models import Post
+from .views import PostDetailView, PostListView, get_comments_page, get_comments_url
+
+EXPORT_DIR = getattr(settings, 'BLOG_EXPORT_DIR', Path(settings.BASE_DIR) / 'export')
+MANIFEST_NAME = 'manifest.json'
+
+
+def public_posts():
+    """Return the posts of the snapshot, in the order of the post list."""
+    return Post.objects.filter(status=1, visibility=0).order_by('-created_on', '-id')
+
+
+def post_states():
+    """Return the primary key, slug and fingerprint of the posts of the
+    snapshot, in the order of the post list."""
+    # The last comment update accounts for the edited comments, which change
+    # neither the post nor its counters.
+    posts = public_posts().annotate(
+        last_commented=Max('comments__updated_on', filter=Q(comments__status=1)),
+    ).values_list('pk', 'slug', 'updated_on', 'like_count', 'comment_count', 'last_commented')
+
+    for pk, slug, *values in posts.iterator():
+        yield pk, slug, fingerprint(*values)
+
+
+def list_page_url(number):
+    url = reverse('blog:home')
+    if number > 1:
+        url = '{}page/{}/'.format(url, number)
+    return url
+
+
+def url_path(output_dir, url):
+    """Return the path of the file serving ``url`` in ``output_dir``."""
+    return Path(output_dir, url.strip('/'), 'index.html')
+
+
+def read_manifest(output_dir):
+    try:
+        with open(Path(output_dir, MANIFEST_NAME)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {'posts': {}, 'pages': []}
+
+
+def write_manifest(output_dir, manifest):
+    write_file(Path(output_dir, MANIFEST_NAME), json.dumps(manifest))
+
+
+def write_file(path, content):
+    # The file is replaced at once, so that it is never served half written.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name('.{}.tmp'.format(path.name))
+    temporary.write_text(content, encoding='utf-8')
+    os.replace(temporary, path)
+
+
+def remove_file(path):
+    try:
+        path.unlink()
+        path.parent.rmdir()
+    except OSError:
+        pass
+
+
+def render_posts(output_dir, post_ids):
+    """Render the details pages of the posts, and return how many were
+    rendered."""
+    user = AnonymousUser()
+    posts = public_posts().filter(pk__in=post_ids).with_stats().defer('content')
+    for post in posts:
+        # The next pages of comments are loaded from Django.
+        comments = get_comments_page(post, user)
+        content = render_to_string(str(PostDetailView.template_name), {
+            'post': post,
+            'object': post,
+            'comments': comments.object_list,
+            'comments_next_url': get_comments_url(post, comments.next_cursor),
+            'user': user,
+            'liked_posts': LikedPosts(),
+        })
+        write_file(url_path(output_dir, reverse('blog:details', args=[post.slug])), content)
+
+    return len(posts)
+
+
+def render_list_pages(output_dir, pages):
+    """Render the list pages, given as (number, post ids, has next page)
+    tuples, and return how many were rendered."""
+    post_ids = [pk for _, page_post_ids, _ in pages for pk in page_post_ids]
+    posts = public_posts().with_stats().defer('content', 'content_html').in_bulk(post_ids)
+    for number, post_ids, has_next in pages:
+        content = render_to_string(str(PostListView.template_name), {
+            'posts': [posts[pk] for pk in post_ids if pk in posts],
+            'user': AnonymousUser(),
+            'liked_posts': LikedPosts(),
+            'previous_page_url': list_page_url(number - 1) if number > 1 else None,
+            'next_page_url': list_page_url(number + 1) if has_next else None,
+        })
+        write_file(url_path(output_dir, list_page_url(number)), content)
+
+    return len(pages)
@@ -1,6 +1,7 @@
 import string
 
 from django.core.exceptions import FieldError
+from django.db import IntegrityError, router, transaction
 from django.db.models import SlugField
 from django.utils.crypto import get_random_string
 
@@ -8,6 +9,11 @@ from django.utils.crypto import get_random_string
 class RandomSlugField(SlugField):
     """Random ASCII based slug."""
 
+    # Number of draws before giving up on finding an available slug.
+    max_attempts = 10
+    # Number of candidates checked by query in populate.
+    batch_size = 500
+
     def __init__(self, length, *args, **kwargs):
         kwargs.setdefault('blank', True)
         kwargs.setdefault('editable', False)
@@ -20,35 +26,64 @@ class RandomSlugField(SlugField):
         super(RandomSlugField, self).__init__(*args, **kwargs)
 
     def generate_slug(self, model_instance):
-        queryset = model_instance.__class__._default_manager.all()
-
-        # Only count slugs that match current length to prevent issues when
-        # pre-existing slugs are a different length.
-        lookup = {'{}__regex'.format(self.attname): r'^.{{{}}}$'.format(self.length)}
-        if queryset.filter(**lookup).count() >= len(self.chars) ** self.length:
-            raise FieldError('No available slugs remaining.')
-
-        slug = get_random_string(self.length, self.chars)
-
-        # Exclude the current model instance from the queryset used in finding
-        # next valid slug.
-        if model_instance.pk:
-            queryset = queryset.exclude(pk=model_instance.pk)
-
-        # Form a kwarg dict used to implement any unique_together constraints.
-        kwargs = {}
-        for params in model_instance._meta.unique_together:
-            if self.attname in params:
-                for param in params:
-                    kwargs[param] = getattr(model_instance, param, None)
-        kwargs[self.attname] = slug
-
-        # Ensure the uniqueness of the slug.
-        while queryset.filter(**kwargs):
-            slug = get_random_string(self.length, self.chars)
-            kwargs[self.attname] = slug
-
-        return slug
+        # The slug is drawn without looking at the table, the uniqueness being
+        # enforced by the unique index (see save_unique and populate).
+        return get_random_string(self.length, self.chars)
+
+    def save_unique(self, model_instance, save, *args, **kwargs):
+        """Call ``save``, drawing a new slug as long as the generated one
+        collides with an existing slug."""
+        if getattr(model_instance, self.attname):
+            return save(*args, **kwargs)
+
+        using = kwargs.get('using') or router.db_for_write(model_instance.__class__, instance=model_instance)
+        for _ in range(self.max_attempts):
+            try:
+                with transaction.atomic(using=using):
+                    return save(*args, **kwargs)
+            except IntegrityError:
+                # Only a collision of the slug is retried.
+                slug = getattr(model_instance, self.attname)
+                queryset = model_instance.__class__._default_manager.using(using)
+                if not queryset.filter(**{self.attname: slug}).exists():
+                    raise
+                setattr(model_instance, self.attname, '')
+
+        raise FieldError('No available slug found after {} attempts.'.format(self.max_attempts))
+
+    def populate(self, model_instances, using=None):
+        """Assign unique slugs to the unsaved instances lacking one, typically
+        before a bulk_create, checking the candidates in batches."""
+        model_instances = [instance for instance in model_instances if not getattr(instance, self.attname)]
+        if not model_instances:
+            return
+
+        queryset = model_instances[0].__class__._default_manager.db_manager(using)
+        assigned = set()
+        for _ in range(self.max_attempts):
+            candidates = {}
+            for instance in model_instances:
+                slug = self.generate_slug(instance)
+                while slug in candidates or slug in assigned:
+                    slug = self.generate_slug(instance)
+                candidates[slug] = instance
+
+            # The candidates already taken are drawn again at the next round.
+            slugs = list(candidates)
+            taken = set()
+            for start in range(0, len(slugs), self.batch_size):
+                lookup = {'{}__in'.format(self.attname): slugs[start:start + self.batch_size]}
+                taken.update(queryset.filter(**lookup).values_list(self.attname, flat=True))
+            for slug, instance in candidates.items():
+                if slug not in taken:
+                    setattr(instance, self.attname, slug)
+                    assigned.add(slug)
+
+            model_instances = [candidates[slug] for slug in taken]
+            if not model_instances:
+                return
+
+        raise FieldError('No available slug found after {} attempts.'.format(self.max_attempts))
 
     def pre_save(self, model_instance, add):
         value = getattr(model_instance, self.attname)
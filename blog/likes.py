@@ -0,0 +1,286 @@
+"""
+Like toggles of the blog, optionally buffered in the cache.
+
+The identifiers of the posts liked by each user are cached as a sorted array,
+read once per request to render the Like/Unlike buttons of any number of posts
+without querying the likes. The array is dropped, or updated in write-behind
+mode, whenever the user toggles a like.
+
+In write-behind mode (BLOG_LIKE_WRITE_BEHIND), a like toggle only writes the
+new state of the (user, post) pair and appends the pair to a log in the cache.
+The log is flushed to the database in bulk by the flush_likes management
+command, the last state of each pair winning. Until then, the pages of a user
+merge the pending states of the user into the displayed posts. The toggles of a
+user are serialized by a short lock in the cache, so that a double click never
+toggles twice from the same state.
+
+The buffer only lives in the cache, hence the write-behind mode requires a cache
+shared by the processes and the flush_likes command, and is refused on the
+local memory and dummy caches. The log entries evicted from the cache before
+being flushed are waited for during one flush, then given up on, their toggles
+being lost.
+"""
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .models import Post, Like
+
+LIKE_CACHE = getattr(settings, 'BLOG_LIKE_CACHE', 'default')
+LIKED_POSTS_TIMEOUT = getattr(settings, 'BLOG_LIKED_POSTS_TIMEOUT', 24 * 60 * 60)
+WRITE_BEHIND = getattr(settings, 'BLOG_LIKE_WRITE_BEHIND', False)
+BUFFER_TIMEOUT = getattr(settings, 'BLOG_LIKE_BUFFER_TIMEOUT', 60 * 60)
+FLUSH_INTERVAL = getattr(settings, 'BLOG_LIKE_FLUSH_INTERVAL', 5)
+FLUSH_BATCH_SIZE = getattr(settings, 'BLOG_LIKE_FLUSH_BATCH_SIZE', 1000)
+TOGGLE_LOCK_TIMEOUT = getattr(settings, 'BLOG_LIKE_TOGGLE_LOCK_TIMEOUT', 2)
+TOGGLE_POLL_INTERVAL = 0.02
+
+SEQUENCE_KEY = 'blog:likes:sequence'
+FLUSHED_KEY = 'blog:likes:flushed'
+GAP_KEY = 'blog:likes:gap'
+LOCK_KEY = 'blog:likes:lock'
+
+
+def _entry_key(number):
+    return 'blog:likes:entry:{}'.format(number)
+
+
+def _state_key(user_id, post_id):
+    return 'blog:likes:state:{}:{}'.format(user_id, post_id)
+
+
+def _liked_posts_key(user_id):
+    return 'blog:likes:user:{}'.format(user_id)
+
+
+def _toggle_lock_key(user_id):
+    return 'blog:likes:toggle:{}'.format(user_id)
+
+
+def check_write_behind_cache(alias=LIKE_CACHE):
+    """Raise ImproperlyConfigured if the cache ``alias`` is not shared by the
+    processes, as the buffered toggles would never reach the flush."""
+    if isinstance(caches[alias], (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            'BLOG_LIKE_WRITE_BEHIND requires the {!r} cache to be shared by the processes, '
+            'not a local memory or dummy cache.'.format(alias))
+
+
+if WRITE_BEHIND:
+    check_write_behind_cache()
+
+
+class LikedPosts(object):
+    """Identifiers of the posts liked by a user, as a sorted array."""
+
+    typecode = 'q'
+
+    def __init__(self, post_ids=()):
+        self.post_ids = array(self.typecode, sorted(post_ids))
+
+    @classmethod
+    def frombytes(cls, data):
+        liked_posts = cls()
+        liked_posts.post_ids.frombytes(data)
+        return liked_posts
+
+    def tobytes(self):
+        return self.post_ids.tobytes()
+
+    def add(self, post_id):
+        if post_id not in self:
+            insort(self.post_ids, post_id)
+
+    def discard(self, post_id):
+        if post_id in self:
+            del self.post_ids[bisect_left(self.post_ids, post_id)]
+
+    def __contains__(self, post_id):
+        index = bisect_left(self.post_ids, post_id)
+        return index < len(self.post_ids) and self.post_ids[index] == post_id
+
+    def __len__(self):
+        return len(self.post_ids)
+
+    def __iter__(self):
+        return iter(self.post_ids)
+
+
+def liked_posts(user):
+    """Return the posts liked by ``user``, loaded at most once per request."""
+    if not user.is_authenticated:
+        return LikedPosts()
+
+    # The set is memoized on the user, which lives as long as the request.
+    if not hasattr(user, '_liked_posts'):
+        cache = caches[LIKE_CACHE]
+        data = cache.get(_liked_posts_key(user.pk))
+        if data is not None:
+            user._liked_posts = LikedPosts.frombytes(data)
+        else:
+            user._liked_posts = LikedPosts(Like.objects.filter(user=user.pk).values_list('post_id', flat=True))
+            cache.set(_liked_posts_key(user.pk), user._liked_posts.tobytes(), LIKED_POSTS_TIMEOUT)
+
+    return user._liked_posts
+
+
+def forget_liked_posts(user_ids):
+    """Drop the cached liked posts of the users, after their likes changed."""
+    caches[LIKE_CACHE].delete_many([_liked_posts_key(user_id) for user_id in user_ids])
+
+
+def toggle_like(user, post_id):
+    """Like or unlike the post for ``user``, and return whether it is liked."""
+    if not WRITE_BEHIND:
+        liked = Like.objects.toggle(user, post_id)
+        forget_liked_posts([user.pk])
+        user.__dict__.pop('_liked_posts', None)
+        return liked
+
+    # The concurrent toggles of the user would read the same state and liked
+    # posts, and write back the same state, losing one of the toggles and any
+    # other post toggled meanwhile. The lock expires if its holder dies, and is
+    # then taken over.
+    cache = caches[LIKE_CACHE]
+    lock_key = _toggle_lock_key(user.pk)
+    deadline = time.monotonic() + TOGGLE_LOCK_TIMEOUT
+    locked = cache.add(lock_key, True, TOGGLE_LOCK_TIMEOUT)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(TOGGLE_POLL_INTERVAL)
+        locked = cache.add(lock_key, True, TOGGLE_LOCK_TIMEOUT)
+    try:
+        return _buffer_toggle(cache, user, post_id)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def _buffer_toggle(cache, user, post_id):
+    state_key = _state_key(user.pk, post_id)
+    # The liked posts are read again under the lock.
+    user.__dict__.pop('_liked_posts', None)
+    user_posts = liked_posts(user)
+    state = cache.get(state_key)
+    if state is not None:
+        # The stored state is the one before the first pending toggle.
+        current, stored = state
+    else:
+        current = stored = post_id in user_posts
+    liked = not current
+
+    # The state is read back by the pages of the user, while the log entry is
+    # what the flush replays, in order. The liked posts of the user are updated
+    # in place since they cannot be rebuilt from the database until the flush.
+    cache.set(state_key, (liked, stored), BUFFER_TIMEOUT)
+    if liked:
+        user_posts.add(post_id)
+    else:
+        user_posts.discard(post_id)
+    cache.set(_liked_posts_key(user.pk), user_posts.tobytes(), LIKED_POSTS_TIMEOUT)
+    cache.add(SEQUENCE_KEY, 0, None)
+    number = cache.incr(SEQUENCE_KEY)
+    cache.set(_entry_key(number), (user.pk, post_id, liked), BUFFER_TIMEOUT)
+
+    return liked
+
+
+def merge_pending_likes(user, posts):
+    """Apply the pending like toggles of ``user`` to the ``like_count`` of
+    ``posts``, the toggles of the other users being counted once flushed."""
+    if not WRITE_BEHIND or not user.is_authenticated or not posts:
+        return posts
+
+    keys = {_state_key(user.pk, post.pk): post for post in posts}
+    for key, (liked, stored) in caches[LIKE_CACHE].get_many(list(keys)).items():
+        if liked != stored:
+            post = keys[key]
+            post.like_count = max(post.like_count + (1 if liked else -1), 0)
+
+    return posts
+
+
+def flush_pending_likes():
+    """Write the buffered like toggles into the database.
+
+    Return the number of log entries flushed, or None if another flush is
+    already running.
+    """
+    cache = caches[LIKE_CACHE]
+    if not cache.add(LOCK_KEY, True, max(FLUSH_INTERVAL * 10, 60)):
+        return None
+
+    try:
+        flushed = start = cache.get(FLUSHED_KEY, 0)
+        end = cache.get(SEQUENCE_KEY, 0)
+        while flushed < end:
+            numbers = range(flushed + 1, min(flushed + FLUSH_BATCH_SIZE, end) + 1)
+            entries = cache.get_many([_entry_key(number) for number in numbers])
+
+            # An entry missing from the log may still be being written by its
+            # toggle, hence it is waited for once, until the next flush, before
+            # being given up on as evicted, its toggle being lost.
+            batch = []
+            for number in numbers:
+                entry = entries.get(_entry_key(number))
+                if entry is None and cache.get(GAP_KEY) != number:
+                    cache.set(GAP_KEY, number, BUFFER_TIMEOUT)
+                    break
+                if entry is not None:
+                    batch.append(entry)
+                flushed = number
+            _write_likes(cache, batch)
+            cache.set(FLUSHED_KEY, flushed, None)
+            cache.delete_many([_entry_key(number) for number in range(numbers[0], flushed + 1)])
+            if flushed < numbers[-1]:
+                break
+    finally:
+        cache.delete(LOCK_KEY)
+
+    return flushed - start
+
+
+def _write_likes(cache, entries):
+    # The entries are coalesced per (user, post), the last state winning.
+    states = {}
+    for user_id, post_id, liked in entries:
+        states[user_id, post_id] = liked
+    if not states:
+        return
+
+    post_ids = {post_id for _, post_id in states}
+    # The toggles of the posts or users deleted in the meantime are dropped.
+    post_ids &= set(Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True))
+    UserModel = Like._meta.get_field('user').related_model
+    user_ids = set(UserModel._default_manager.filter(
+        pk__in={user_id for user_id, _ in states}).values_list('pk', flat=True))
+
+    unliked = {}
+    liked = []
+    for (user_id, post_id), state in states.items():
+        if post_id not in post_ids or user_id not in user_ids:
+            continue
+        if state:
+            liked.append(Like(user_id=user_id, post_id=post_id))
+        else:
+            unliked.setdefault(post_id, []).append(user_id)
+
+    with transaction.atomic():
+        Like.objects.bulk_create(liked, ignore_conflicts=True)
+        for post_id, unliking_ids in unliked.items():
+            Like.objects.filter(post_id=post_id, user_id__in=unliking_ids).delete()
+        # Whether the toggles changed anything is unknown, so the counters of
+        # the posts are recomputed, which touches the ones that changed.
+        Post.objects.filter(pk__in=post_ids).reconcile_counters()
+
+    # The pending states are now stored, unless toggled again in the meantime.
+    keys = {_state_key(user_id, post_id): state for (user_id, post_id), state in states.items()}
+    cache.delete_many([
+        key for key, (liked, stored) in cache.get_many(list(keys)).items() if liked == keys[key]
+    ])
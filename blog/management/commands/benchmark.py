@@ -0,0 +1,206 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Post
+
+SCENARIOS = ('home', 'home_authenticated', 'details', 'like', 'create', 'login')
+
+
+class Rollback(Exception):
+    """Raised to roll the changes of the benchmark back."""
+
+
+class Command(BaseCommand):
+    """Benchmark the main views of the blog."""
+
+    help = (
+        'Request the main views of the blog through the test client, and report the latency percentiles, '
+        'the queries per request and the peak memory of each of them. Run it against a seeded database '
+        '(see seed_blog), the changes of the benchmark being rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios', nargs='*', metavar='scenario',
+            help='Scenarios to run among {} (default: all of them).'.format(', '.join(SCENARIOS)),
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario (default: 200).')
+        parser.add_argument('--warmup', type=int, default=10, help='Requests ignored per scenario (default: 10).')
+        parser.add_argument(
+            '--memory-requests', type=int, default=20,
+            help='Requests per scenario traced for the peak memory, apart from the timed ones (default: 20).',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator (default: 0).')
+        parser.add_argument(
+            '--password', default='password',
+            help='Password of the users logging in (default: the one of seed_blog).',
+        )
+        parser.add_argument('--host', default='localhost', help='Host of the requests (default: localhost).')
+        parser.add_argument(
+            '--accept-encoding', default='gzip, deflate, br',
+            help='Accept-Encoding header of the requests, empty for none (default: the one of the browsers).',
+        )
+        parser.add_argument('--output', help='JSON file the results are written to.')
+        parser.add_argument('--compare', help='JSON file of a previous run the results are compared to.')
+
+    def handle(self, *args, **options):
+        unknown = set(options['scenarios']).difference(SCENARIOS)
+        if unknown:
+            raise CommandError('Unknown scenarios: {}.'.format(', '.join(sorted(unknown))))
+        if options['requests'] < 2:
+            raise CommandError('At least two requests per scenario are needed for the percentiles.')
+        self.random = random.Random(options['seed'])
+        self.options = options
+        UserModel = get_user_model()
+
+        self.user_ids = list(UserModel._default_manager.filter(is_active=True).values_list('pk', flat=True))
+        self.post_slugs = list(Post.objects.filter(status=1, visibility=0).values_list('slug', flat=True))
+        if not self.user_ids or not self.post_slugs:
+            raise CommandError('The database holds no user or no public post, see the seed_blog command.')
+
+        results = {}
+        try:
+            with transaction.atomic():
+                for scenario in options['scenarios'] or SCENARIOS:
+                    results[scenario] = self.run(scenario)
+                    self.stdout.write(self.format_result(scenario, results[scenario]))
+                raise Rollback
+        except Rollback:
+            pass
+
+        report = {
+            'date': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'users': len(self.user_ids),
+            'public_posts': len(self.post_slugs),
+            'options': {
+                key: options[key] for key in ('requests', 'warmup', 'memory_requests', 'seed', 'accept_encoding')
+            },
+            'scenarios': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS('Results written to {}.'.format(options['output'])))
+        if options['compare']:
+            self.compare(json.loads(Path(options['compare']).read_text()), report)
+
+    def run(self, scenario):
+        # The requests are prepared beforehand, the logins of the users
+        # included, so that only the requests themselves are measured.
+        client = Client(SERVER_NAME=self.options['host'], HTTP_ACCEPT_ENCODING=self.options['accept_encoding'])
+        prepare = getattr(self, 'prepare_{}'.format(scenario))
+        for _ in range(self.options['warmup']):
+            prepare(client)()
+
+        latencies, queries, sizes = [], [], []
+        for _ in range(self.options['requests']):
+            request = prepare(client)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = request()
+                # The streamed bodies are only produced as they are read.
+                sizes.append(len(response.getvalue()))
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+            if response.status_code >= 400:
+                raise CommandError('{} answered {}.'.format(scenario, response.status_code))
+
+        # The memory is traced apart, as tracing slows the requests down.
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(self.options['memory_requests']):
+                request = prepare(client)
+                tracemalloc.reset_peak()
+                request()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        return {
+            'requests': len(latencies),
+            'mean_ms': statistics.mean(latencies),
+            'p50_ms': percentiles[49],
+            'p95_ms': percentiles[94],
+            'p99_ms': percentiles[98],
+            'queries_mean': statistics.mean(queries),
+            'queries_max': max(queries),
+            'bytes_mean': statistics.mean(sizes),
+            'peak_memory_kib': max(peaks, default=0) / 1024,
+        }
+
+    def login(self, client):
+        client.force_login(get_user_model()._default_manager.get(pk=self.random.choice(self.user_ids)))
+
+    def prepare_home(self, client):
+        client.logout()
+        return lambda: client.get(reverse('blog:home'))
+
+    def prepare_home_authenticated(self, client):
+        self.login(client)
+        return lambda: client.get(reverse('blog:home'))
+
+    def prepare_details(self, client):
+        client.logout()
+        return lambda: client.get(reverse('blog:details', args=[self.random.choice(self.post_slugs)]))
+
+    def prepare_like(self, client):
+        self.login(client)
+        post_id = Post.objects.filter(slug=self.random.choice(self.post_slugs)).values_list('pk', flat=True).get()
+        return lambda: client.post(reverse('blog:like', args=[post_id]), HTTP_ACCEPT='application/json')
+
+    def prepare_create(self, client):
+        self.login(client)
+        return lambda: client.post(reverse('blog:create'), {
+            'title': 'Benchmark post', 'content': '<p>Benchmark content.</p>', 'visibility': 0, 'status': 1,
+        })
+
+    def prepare_login(self, client):
+        client.logout()
+        email = get_user_model()._default_manager.values_list('email', flat=True).get(
+            pk=self.random.choice(self.user_ids))
+        # The logins come from distinct addresses, as the attempts of a single
+        # one would soon be throttled.
+        address = '10.{}.{}.{}'.format(*(self.random.randrange(256) for _ in range(3)))
+        return lambda: self.check_login(client.post(
+            reverse('users:login'), {'email': email, 'password': self.options['password']}, REMOTE_ADDR=address))
+
+    def check_login(self, response):
+        if response.status_code != 302:
+            raise CommandError(
+                'A login failed, the password is wrong or the attempts of the user were throttled '
+                '(see users/throttling.py).'
+            )
+        return response
+
+    def format_result(self, scenario, result):
+        return (
+            '{scenario:<20} p50 {p50_ms:8.2f} ms  p95 {p95_ms:8.2f} ms  p99 {p99_ms:8.2f} ms  '
+            '{queries_mean:6.1f} queries  {bytes_mean:9.0f} bytes  {peak_memory_kib:9.1f} KiB'.format(
+                scenario=scenario, **result)
+        )
+
+    def compare(self, previous, report):
+        self.stdout.write('Compared to the run of {}:'.format(previous['date']))
+        for scenario, result in report['scenarios'].items():
+            before = previous['scenarios'].get(scenario)
+            if before is None:
+                continue
+            changes = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'bytes_mean', 'peak_memory_kib'):
+                if before.get(key):
+                    changes.append('{} {:+.1f}%'.format(key, (result[key] - before[key]) / before[key] * 100))
+            self.stdout.write('{:<20} {}'.format(scenario, '  '.join(changes)))
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.urls import reverse
+
+from blog.export import (
+    EXPORT_DIR, fingerprint, list_page_url, post_states, read_manifest, remove_file, render_list_pages,
+    render_posts, url_path, write_manifest,
+)
+from blog.views import POSTS_PER_PAGE
+
+
+class Command(BaseCommand):
+    """Export the public blog as static files."""
+
+    help = (
+        'Render the post list and the public posts into static files, only re-rendering what changed '
+        'since the last export. Use --full after changing the templates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=str(EXPORT_DIR),
+            help='Directory the files are written to (default: BLOG_EXPORT_DIR).',
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Render everything again, ignoring the manifest of the last export.',
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=os.cpu_count(),
+            help='Number of rendering processes (default: the number of CPUs).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of posts or list pages rendered per task (default: 100).',
+        )
+
+    def handle(self, *args, **options):
+        output_dir = options['output']
+        batch_size = options['batch_size']
+        manifest = {'posts': {}, 'pages': []} if options['full'] else read_manifest(output_dir)
+
+        # The posts are compared with the last export by their fingerprints,
+        # and so are the list pages, by the fingerprints of their posts.
+        posts, pages, page = {}, [], []
+        for pk, slug, post_fingerprint in post_states():
+            posts[str(pk)] = [slug, post_fingerprint]
+            page.append((pk, post_fingerprint))
+            if len(page) == POSTS_PER_PAGE:
+                pages.append(page)
+                page = []
+        if page or not pages:
+            pages.append(page)
+
+        changed_posts = [int(pk) for pk, state in posts.items() if manifest['posts'].get(pk) != state]
+        changed_pages = []
+        page_fingerprints = []
+        for number, page in enumerate(pages, 1):
+            has_next = number < len(pages)
+            page_fingerprints.append(fingerprint(page, has_next))
+            if manifest['pages'][number - 1:number] != page_fingerprints[-1:]:
+                changed_pages.append((number, [pk for pk, _ in page], has_next))
+
+        rendered_posts = sum(self.render(render_posts, output_dir, changed_posts, batch_size, options['jobs']))
+        rendered_pages = sum(self.render(render_list_pages, output_dir, changed_pages, batch_size, options['jobs']))
+
+        # The posts unpublished, hidden or deleted since are removed.
+        removed = 0
+        for pk, (slug, _) in manifest['posts'].items():
+            if pk not in posts:
+                remove_file(url_path(output_dir, reverse('blog:details', args=[slug])))
+                removed += 1
+        for number in range(len(pages) + 1, len(manifest['pages']) + 1):
+            remove_file(url_path(output_dir, list_page_url(number)))
+
+        write_manifest(output_dir, {'posts': posts, 'pages': page_fingerprints})
+        self.stdout.write(self.style.SUCCESS('Rendered {} posts and {} list pages, removed {} posts.'.format(
+            rendered_posts, rendered_pages, removed)))
+
+    def render(self, function, output_dir, items, batch_size, jobs):
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        if jobs <= 1 or len(batches) <= 1:
+            return [function(output_dir, batch) for batch in batches]
+
+        # The workers are spawned rather than forked, so that they open their own
+        # database connections instead of sharing the ones of this process.
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(min(jobs, len(batches)), mp_context=context, initializer=django.setup) as pool:
+            return list(pool.map(function, repeat(output_dir), batches))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.likes import FLUSH_INTERVAL, flush_pending_likes
+
+
+class Command(BaseCommand):
+    """Flush the buffered like toggles into the database."""
+
+    help = 'Write the like toggles buffered in the cache into the database, in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='Keep flushing the buffer at a regular interval instead of flushing it once.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=FLUSH_INTERVAL,
+            help='Seconds between two flushes in watch mode (default: BLOG_LIKE_FLUSH_INTERVAL).',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_pending_likes()
+            if flushed is None:
+                self.stderr.write('Another flush is running, skipped.')
+            elif flushed or options['verbosity'] > 1:
+                self.stdout.write('Flushed {} like toggles.'.format(flushed))
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,99 @@
+from argparse import ArgumentTypeError
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blog.models import Post, Comment
+from blog.moderation import CHUNK_SIZE, COMMENT_ACTIONS, POST_ACTIONS, moderate_comments, moderate_posts
+from blog.search import search_post_ids
+
+
+def datetime_argument(value):
+    date = parse_datetime(value)
+    if date is None:
+        raise ArgumentTypeError('{!r} is not an ISO 8601 date and time.'.format(value))
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Command(BaseCommand):
+    """Moderate the blog posts or comments matching filters."""
+
+    help = (
+        'Publish, draft, hide, show or delete the posts or comments matching the filters, '
+        'in chunks of set-based statements.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=('posts', 'comments'), help='What to moderate.')
+        parser.add_argument(
+            'action', choices=sorted(POST_ACTIONS),
+            help='Moderation to apply, hide and show only applying to the posts.',
+        )
+        parser.add_argument('--author', help='Email of the author of the posts or comments.')
+        parser.add_argument('--post', help='Slug of the post of the comments.')
+        parser.add_argument('--status', type=int, choices=(0, 1), help='Status of the posts or comments.')
+        parser.add_argument('--visibility', type=int, choices=(0, 1), help='Visibility of the posts.')
+        parser.add_argument('--search', help='Words of the posts, or of the posts of the comments.')
+        parser.add_argument('--created-after', type=datetime_argument, help='Creation date lower bound (ISO 8601).')
+        parser.add_argument('--created-before', type=datetime_argument, help='Creation date upper bound (ISO 8601).')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Number of rows moderated per transaction (default: BLOG_MODERATION_CHUNK_SIZE).',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the posts or comments matching the filters.',
+        )
+
+    def handle(self, *args, **options):
+        if options['model'] == 'posts':
+            queryset, moderate = Post.objects.all(), moderate_posts
+            if options['post']:
+                raise CommandError('--post only filters the comments.')
+            if options['visibility'] is not None:
+                queryset = queryset.filter(visibility=options['visibility'])
+            if options['search']:
+                queryset = queryset.filter(pk__in=self.search(options))
+        else:
+            queryset, moderate = Comment.objects.all(), moderate_comments
+            if options['action'] not in COMMENT_ACTIONS:
+                raise CommandError('The comments cannot be moderated with {}.'.format(options['action']))
+            if options['visibility'] is not None:
+                raise CommandError('--visibility only filters the posts.')
+            if options['post']:
+                queryset = queryset.filter(post__slug=options['post'])
+            if options['search']:
+                queryset = queryset.filter(post__in=self.search(options))
+
+        if options['author']:
+            queryset = queryset.filter(author__email=options['author'])
+        if options['status'] is not None:
+            queryset = queryset.filter(status=options['status'])
+        if options['created_after']:
+            queryset = queryset.filter(created_on__gte=options['created_after'])
+        if options['created_before']:
+            queryset = queryset.filter(created_on__lt=options['created_before'])
+
+        if options['dry_run']:
+            self.stdout.write('{} {} would be moderated.'.format(queryset.count(), options['model']))
+            return
+
+        moderated = 0
+        for moderated in moderate(queryset, options['action'], options['chunk_size']):
+            if options['verbosity'] > 0:
+                self.stdout.write('Moderated {} {}...'.format(moderated, options['model']))
+
+        self.stdout.write(self.style.SUCCESS('Moderated {} {} ({}).'.format(
+            moderated, options['model'], options['action'])))
+
+    def search(self, options):
+        """Return the identifiers of the posts matching the search."""
+        # All the matching posts are moderated, rather than the most relevant
+        # ones the pages of results are limited to.
+        post_ids = search_post_ids(options['search'], limit=None)
+        if options['verbosity'] > 0:
+            self.stdout.write('{} posts match the search.'.format(len(post_ids)))
+        return post_ids
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post, Comment
+from blog.search import index_comments, index_posts
+
+
+class Command(BaseCommand):
+    """Index all the blog posts and comments in the full-text search index."""
+
+    help = 'Index all the posts and comments in the full-text search index, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of posts or comments indexed per batch (default: 500).',
+        )
+
+    def handle(self, *args, **options):
+        indexed = self.index(Post.objects.only('pk'), lambda batch: index_posts([post.pk for post in batch]), options)
+        self.stdout.write(self.style.SUCCESS('Indexed {} posts.'.format(indexed)))
+        indexed = self.index(Comment.objects.only('content'), index_comments, options)
+        self.stdout.write(self.style.SUCCESS('Indexed {} comments.'.format(indexed)))
+
+    def index(self, queryset, index, options):
+        last_pk, indexed = 0, 0
+
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                index(batch)
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+            if options['verbosity'] > 1:
+                self.stdout.write('Indexed {} {}.'.format(indexed, queryset.model._meta.verbose_name_plural))
+
+        return indexed
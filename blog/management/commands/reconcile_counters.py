@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    """Recompute the like and comment counters of the blog posts."""
+
+    help = 'Recompute the denormalized like and comment counters of the posts in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of posts reconciled per batch (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk, checked, fixed = 0, 0, 0
+
+        # The posts are walked by primary key ranges, so that each batch is a
+        # short index range scan and no long transaction is held.
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            fixed += Post.objects.filter(pk__in=pks).reconcile_counters()
+            checked += len(pks)
+            last_pk = pks[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write('Checked {} posts, fixed {}.'.format(checked, fixed))
+
+        self.stdout.write(self.style.SUCCESS('Checked {} posts, fixed {}.'.format(checked, fixed)))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.models import Post, Comment
+
+
+class Command(BaseCommand):
+    """Render the excerpts and the HTML of the posts and comments."""
+
+    help = 'Render the excerpts and the sanitized HTML of the posts and comments stored before they were rendered.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Render all the posts and comments again, instead of the ones never rendered.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of posts or comments rendered per batch (default: 500).',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only('content')
+        comments = Comment.objects.only('content', 'post')
+        if not options['all']:
+            posts = posts.filter(content_html='').exclude(content='')
+            comments = comments.filter(content_html='').exclude(content='')
+
+        rendered = self.render(posts, ('excerpt', 'content_html', 'updated_on'), options)
+        self.stdout.write(self.style.SUCCESS('Rendered {} posts.'.format(rendered)))
+        rendered = self.render(comments, ('content_html', 'updated_on'), options)
+        self.stdout.write(self.style.SUCCESS('Rendered {} comments.'.format(rendered)))
+
+    def render(self, queryset, fields, options):
+        last_pk, rendered = 0, 0
+
+        # The rows are walked by primary key ranges, each batch being written
+        # by a single bulk update that bypasses the save signals. Their update
+        # time changes the validators of their pages.
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+            now = timezone.now()
+            for obj in batch:
+                obj.render_content()
+                obj.updated_on = now
+            queryset.model.objects.bulk_update(batch, fields)
+            rendered += len(batch)
+            last_pk = batch[-1].pk
+            if options['verbosity'] > 1:
+                self.stdout.write('Rendered {} {}.'.format(rendered, queryset.model._meta.verbose_name_plural))
+
+        return rendered
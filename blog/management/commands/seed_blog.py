@@ -0,0 +1,138 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post, Comment, Like
+from blog.search import index_comments, index_posts
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore '
+    'magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo '
+    'consequat duis aute irure in reprehenderit voluptate velit esse cillum fugiat nulla pariatur excepteur sint '
+    'occaecat cupidatat non proident sunt culpa qui officia deserunt mollit anim id est laborum'
+).split()
+
+
+class Command(BaseCommand):
+    """Seed the database with a synthetic blog."""
+
+    help = (
+        'Insert synthetic users, posts, comments and likes in bulk, for benchmarking. The activity is skewed, '
+        'a few users writing most of the posts and a few posts getting most of the comments and likes, and '
+        'the same seed always generates the same dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users (default: 1000).')
+        parser.add_argument('--posts', type=int, default=10000, help='Number of posts (default: 10000).')
+        parser.add_argument('--comments', type=int, default=50000, help='Number of comments (default: 50000).')
+        parser.add_argument('--likes', type=int, default=100000, help='Number of likes, at most (default: 100000).')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator (default: 0).')
+        parser.add_argument(
+            '--password', default='password',
+            help='Password of all the users, hashed once (default: password).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows inserted per statement (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        UserModel = get_user_model()
+
+        # The users of the different seeds never collide.
+        password = make_password(options['password'])
+        user_ids = self.insert(UserModel, (
+            UserModel(
+                email='user{}.{}@example.com'.format(options['seed'], i), password=password,
+                title=self.random.randrange(5), first_name=self.sentence(1, 1), last_name=self.sentence(1, 2),
+            )
+            for i in range(options['users'])
+        ))
+        self.report('users', user_ids)
+
+        # Zipf-like weights, the activity of the n-th user or post being
+        # proportional to 1 / n.
+        user_weights = list(accumulate(1 / rank for rank in range(1, len(user_ids) + 1)))
+        post_ids = self.insert(Post, (
+            Post(
+                title=self.sentence(3, 10), content=self.paragraphs(),
+                author_id=self.random.choices(user_ids, cum_weights=user_weights)[0],
+                status=int(self.random.random() < 0.9), visibility=int(self.random.random() < 0.2),
+            )
+            for _ in range(options['posts'])
+        ))
+        self.report('posts', post_ids)
+
+        popular_posts = self.random.sample(post_ids, len(post_ids))
+        post_weights = list(accumulate(1 / rank for rank in range(1, len(post_ids) + 1)))
+        comment_ids = self.insert(Comment, (
+            self.comment(
+                post_id=self.random.choices(popular_posts, cum_weights=post_weights)[0],
+                author_id=self.random.choices(user_ids, cum_weights=user_weights)[0],
+                status=int(self.random.random() < 0.95),
+            )
+            for _ in range(options['comments'])
+        ))
+        self.report('comments', comment_ids)
+
+        # A user likes a post at most once, hence the repeated draws are
+        # dropped.
+        likes = {
+            (self.random.choice(user_ids), self.random.choices(popular_posts, cum_weights=post_weights)[0])
+            for _ in range(options['likes'])
+        }
+        like_ids = self.insert(Like, (Like(user_id=user_id, post_id=post_id) for user_id, post_id in likes))
+        self.report('likes', like_ids)
+
+        # The inserts bypassed the signals, hence the counters and the search
+        # index are brought up to date afterwards.
+        for i in range(0, len(post_ids), self.batch_size):
+            batch = post_ids[i:i + self.batch_size]
+            with transaction.atomic():
+                Post.objects.filter(pk__in=batch).reconcile_counters()
+                index_posts(batch)
+        for i in range(0, len(comment_ids), self.batch_size):
+            batch = comment_ids[i:i + self.batch_size]
+            index_comments(Comment.objects.filter(pk__in=batch).only('content'))
+        self.stdout.write(self.style.SUCCESS(
+            'Counted and indexed {} posts, and indexed {} comments.'.format(len(post_ids), len(comment_ids))))
+
+    def insert(self, model, objs):
+        """Insert the objects in batches, and return the primary keys of the
+        rows inserted."""
+        # The primary keys are not returned by every database on bulk inserts,
+        # they are read back instead.
+        last_pk = model._default_manager.order_by('-pk').values_list('pk', flat=True).first() or 0
+        batch = []
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                model._default_manager.bulk_create(batch)
+                batch = []
+        model._default_manager.bulk_create(batch)
+
+        return list(model._default_manager.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+
+    def report(self, name, pks):
+        self.stdout.write('Inserted {} {}.'.format(len(pks), name))
+
+    def comment(self, **kwargs):
+        comment = Comment(content=self.sentence(5, 40), **kwargs)
+        comment.render_content()
+        return comment
+
+    def sentence(self, shortest, longest):
+        words = self.random.choices(WORDS, k=self.random.randint(shortest, longest))
+        return ' '.join(words).capitalize()
+
+    def paragraphs(self):
+        # The lengths of the posts follow a long tail as well.
+        count = min(int(self.random.paretovariate(1.5)), 20)
+        return ''.join('<p>{}.</p>'.format(self.sentence(20, 120)) for _ in range(count))
@@ -0,0 +1,157 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .search import search_post_ids
+
+
+class PostQuerySet(models.QuerySet):
+    """Queries of blog posts."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # The random slugs are assigned beforehand, as pre_save cannot retry a
+        # colliding slug within a bulk insert, and the content is rendered as
+        # save() would.
+        objs = list(objs)
+        self.model._meta.get_field('slug').populate(objs, using=self.db)
+        for obj in objs:
+            obj.render_content()
+        return super(PostQuerySet, self).bulk_create(objs, *args, **kwargs)
+
+    def with_stats(self):
+        """Prepare the posts for the blog templates.
+
+        The author is joined, the numbers of likes and comments being stored on
+        the posts themselves and the liked posts of the user being cached, so
+        that a list of posts costs a single query regardless of its length.
+        """
+        return self.select_related('author')
+
+    def search(self, query, **filters):
+        """Filter the posts matching the words of ``query`` through the full-text
+        index, the most relevant first.
+
+        The filters on the status and visibility of the posts are applied by the
+        index, so that the posts filtered out never take the place of others
+        among its limited results.
+        """
+        post_ids = search_post_ids(query, using=self.db, **filters)
+        if not post_ids:
+            return self.none()
+
+        relevance = Case(*[When(pk=pk, then=rank) for rank, pk in enumerate(post_ids)],
+                         output_field=models.IntegerField())
+        return self.filter(pk__in=post_ids, **filters).order_by(relevance)
+
+    def with_actual_counts(self):
+        """Annotate the posts with their likes and published comments counted
+        from the related tables, as opposed to the stored counters."""
+        Like = self.model._meta.get_field('likes').related_model
+        Comment = self.model._meta.get_field('comments').related_model
+
+        likes = (
+            Like.objects.filter(post=OuterRef('pk'))
+            .order_by().values('post').annotate(total=Count('pk')).values('total')
+        )
+        comments = (
+            Comment.objects.filter(post=OuterRef('pk'), status=1)
+            .order_by().values('post').annotate(total=Count('pk')).values('total')
+        )
+
+        return self.annotate(
+            actual_like_count=Coalesce(Subquery(likes, output_field=models.IntegerField()), 0),
+            actual_comment_count=Coalesce(Subquery(comments, output_field=models.IntegerField()), 0),
+        )
+
+    def reconcile_counters(self):
+        """Fix the stored counters of the posts that drifted, and return how
+        many of them were updated."""
+        drifted = (
+            self.with_actual_counts()
+            .filter(~Q(like_count=F('actual_like_count')) | ~Q(comment_count=F('actual_comment_count')))
+            .values_list('pk', 'actual_like_count', 'actual_comment_count')
+        )
+        now = timezone.now()
+        posts = [
+            self.model(pk=pk, like_count=like_count, comment_count=comment_count, updated_on=now)
+            for pk, like_count, comment_count in drifted
+        ]
+        self.model._default_manager.bulk_update(posts, ['like_count', 'comment_count', 'updated_on'])
+
+        return len(posts)
+
+    def shift_counter(self, field, delta):
+        """Atomically add ``delta`` to the counter ``field`` of the posts."""
+        if not delta:
+            return 0
+        if delta > 0:
+            return self.update(**{field: F(field) + delta, 'updated_on': timezone.now()})
+        # The counters never go below zero, even if they drifted.
+        return self.update(**{field: Greatest(F(field) + delta, 0), 'updated_on': timezone.now()})
+
+    def touch(self):
+        """Mark the posts as updated, so that the validators of their pages
+        change, when something their pages show changed outside of their rows.
+
+        The counters of the posts are shown on their pages, hence their updates
+        touch the posts too.
+        """
+        return self.update(updated_on=timezone.now())
+
+
+class CommentQuerySet(models.QuerySet):
+    """Queries of blog comments."""
+
+    def visible_to(self, user):
+        """Filter the comments ``user`` has access to: all the published and
+        drafted comments for a staff user, the published comments and their
+        own drafts for the others."""
+        if user.is_staff:
+            return self
+
+        query = Q(status=1)
+        if user.is_authenticated:
+            query.add(Q(author=user), Q.OR)
+        return self.filter(query)
+
+    def visible_parts(self, user):
+        """Return the disjoint querysets the comments ``user`` has access to
+        are split into, each one served in its (created_on, id) order by an
+        index, unlike the OR of visible_to."""
+        if user.is_staff:
+            return [self.filter(status=1), self.filter(status=0)]
+
+        parts = [self.filter(status=1)]
+        if user.is_authenticated:
+            parts.append(self.filter(status=0, author=user))
+        return parts
+
+
+class LikeQuerySet(models.QuerySet):
+    """Queries of blog likes."""
+
+    def toggle(self, user, post_id):
+        """Like the post if ``user`` did not like it yet, unlike it otherwise,
+        and return whether the post is now liked.
+
+        The like itself is a single DELETE, or a single INSERT if nothing was
+        deleted, followed by the update of the counter of the post.
+        """
+        Post = self.model._meta.get_field('post').related_model
+
+        with transaction.atomic():
+            deleted, _ = self.filter(user=user, post_id=post_id).delete()
+            if deleted:
+                Post.objects.filter(pk=post_id).shift_counter('like_count', -deleted)
+                return False
+
+            try:
+                with transaction.atomic():
+                    self.create(user=user, post_id=post_id)
+            except IntegrityError:
+                # A concurrent request of the same user already liked the post.
+                return True
+            Post.objects.filter(pk=post_id).shift_counter('like_count', 1)
+
+        return True
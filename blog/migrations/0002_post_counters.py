@@ -0,0 +1,42 @@
+# Generated by Django 3.1 on 2026-10-18 08:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_likes_and_comments(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    Like = apps.get_model('blog', 'Like')
+
+    likes = Like.objects.filter(post=OuterRef('pk')).annotate(total=Count('users')).values('total')
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk'), status=1)
+        .order_by().values('post').annotate(total=Count('pk')).values('total')
+    )
+    Post.objects.update(
+        like_count=Coalesce(Subquery(likes, output_field=models.IntegerField()), 0),
+        comment_count=Coalesce(Subquery(comments, output_field=models.IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_likes_and_comments, migrations.RunPython.noop),
+    ]
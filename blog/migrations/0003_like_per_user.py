@@ -0,0 +1,103 @@
+# Generated by Django 3.1 on 2026-10-18 08:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def copy_likes(apps, schema_editor):
+    LegacyLike = apps.get_model('blog', 'LegacyLike')
+    Like = apps.get_model('blog', 'Like')
+    Through = LegacyLike.users.through
+    like_field = Through._meta.get_field(LegacyLike.users.field.m2m_field_name())
+    user_field = Through._meta.get_field(LegacyLike.users.field.m2m_reverse_field_name())
+
+    # The likes are copied by a single set-based statement, which also keeps
+    # their creation dates.
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        'INSERT INTO {like} ({post}, {user}, {created_on}) '
+        'SELECT legacy.{legacy_post}, through.{through_user}, legacy.{legacy_created_on} '
+        'FROM {legacy} legacy INNER JOIN {through} through ON through.{through_like} = legacy.{legacy_pk}'.format(
+            like=quote(Like._meta.db_table),
+            post=quote(Like._meta.get_field('post').column),
+            user=quote(Like._meta.get_field('user').column),
+            created_on=quote(Like._meta.get_field('created_on').column),
+            legacy=quote(LegacyLike._meta.db_table),
+            legacy_pk=quote(LegacyLike._meta.pk.column),
+            legacy_post=quote(LegacyLike._meta.get_field('post').column),
+            legacy_created_on=quote(LegacyLike._meta.get_field('created_on').column),
+            through=quote(Through._meta.db_table),
+            through_like=quote(like_field.column),
+            through_user=quote(user_field.column),
+        )
+    )
+
+
+def copy_likes_back(apps, schema_editor):
+    LegacyLike = apps.get_model('blog', 'LegacyLike')
+    Like = apps.get_model('blog', 'Like')
+    Through = LegacyLike.users.through
+    like_field = LegacyLike.users.field.m2m_field_name()
+    user_field = LegacyLike.users.field.m2m_reverse_field_name()
+
+    legacy_ids = {}
+    batch = []
+    for post_id, user_id in Like.objects.order_by('post_id').values_list('post_id', 'user_id').iterator():
+        if post_id not in legacy_ids:
+            legacy_ids[post_id] = LegacyLike.objects.create(post_id=post_id).pk
+        batch.append(Through(**{'{}_id'.format(like_field): legacy_ids[post_id], '{}_id'.format(user_field): user_id}))
+        if len(batch) >= BATCH_SIZE:
+            Through.objects.bulk_create(batch)
+            batch = []
+    Through.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0002_post_counters'),
+    ]
+
+    operations = [
+        # The previous design, a like per post holding the users, is kept aside
+        # until the likes are copied into one row per user and post.
+        migrations.RenameModel(
+            old_name='Like',
+            new_name='LegacyLike',
+        ),
+        migrations.AlterField(
+            model_name='legacylike',
+            name='post',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post'),
+        ),
+        migrations.AlterField(
+            model_name='legacylike',
+            name='users',
+            field=models.ManyToManyField(related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='Like',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='blog.post')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post'], name='blog_like_post_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='blog_like_user_post_unique'),
+        ),
+        migrations.RunPython(copy_likes, copy_likes_back),
+        migrations.DeleteModel(
+            name='LegacyLike',
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # The index is only created on the databases supporting full-text search,
+    # the others falling back to substring searches.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE blog_post_search USING fts5(title, body, comments, tokenize='porter unicode61')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE blog_post_search ('
+            'post_id integer PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute('CREATE INDEX blog_post_search_document_idx ON blog_post_search USING GIN (document)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE blog_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_rendered_content'),
+    ]
+
+    operations = [
+        # The existing posts are indexed by the rebuild_search_index command.
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.1 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        # The index of the comment authors is only dropped once superseded.
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'author', 'status', 'created_on'], name='blog_comment_author_thread_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='blog_comment_post_author_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-created_on', '-id'], name='blog_post_published_idx'),
+        ),
+    ]
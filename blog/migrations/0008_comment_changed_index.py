@@ -0,0 +1,17 @@
+# Generated by Django 3.1 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_listing_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'updated_on'], name='blog_comment_changed_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+def split_search_index(apps, schema_editor):
+    # The comments are dropped from the documents of the posts, and indexed on
+    # their own by the rebuild_search_index command.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE blog_post_search_new USING fts5(title, body, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            'INSERT INTO blog_post_search_new (rowid, title, body) SELECT rowid, title, body FROM blog_post_search'
+        )
+        schema_editor.execute('DROP TABLE blog_post_search')
+        schema_editor.execute('ALTER TABLE blog_post_search_new RENAME TO blog_post_search')
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE blog_comment_search USING fts5(content, tokenize='porter unicode61')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("UPDATE blog_post_search SET document = ts_filter(document, '{a,b}')")
+        schema_editor.execute(
+            'CREATE TABLE blog_comment_search ('
+            'comment_id integer PRIMARY KEY '
+            'REFERENCES blog_comment (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX blog_comment_search_document_idx ON blog_comment_search USING GIN (document)'
+        )
+
+
+def merge_search_index(apps, schema_editor):
+    # The documents of the posts are indexed again with their comments by the
+    # rebuild_search_index command of the previous version.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE blog_comment_search')
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE blog_post_search_old USING fts5(title, body, comments, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            'INSERT INTO blog_post_search_old (rowid, title, body, comments) '
+            "SELECT rowid, title, body, '' FROM blog_post_search"
+        )
+        schema_editor.execute('DROP TABLE blog_post_search')
+        schema_editor.execute('ALTER TABLE blog_post_search_old RENAME TO blog_post_search')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE blog_comment_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_comment_changed_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_search_index, merge_search_index),
+    ]
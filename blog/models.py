@@ -1,9 +1,12 @@
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
+from django.utils.text import Truncator
 from django.utils.translation import gettext_lazy as _
 
 from .fields import RandomSlugField
+from .managers import PostQuerySet, CommentQuerySet, LikeQuerySet
+from .sanitizer import sanitize
 
 # Quick-start model field settings
 USER_MODEL = getattr(settings, 'AUTH_USER_MODEL', User)
@@ -11,6 +14,7 @@ VISIBILITY = ((0, _('Everybody')), (1, _('Authenticated users only')))
 STATUS = ((0, _('Draft')), (1, _('Published')))
 POST_SLUG_MAX_LENGTH = getattr(settings, 'POST_SLUG_MAX_LENGTH', 15)
 POST_TITLE_MAX_LENGTH = getattr(settings, 'POST_TITLE_MAX_LENGTH', 200)
+POST_EXCERPT_LENGTH = getattr(settings, 'POST_EXCERPT_LENGTH', 200)
 
 
 class Post(models.Model):
@@ -20,48 +24,109 @@ class Post(models.Model):
     title = models.CharField(max_length=POST_TITLE_MAX_LENGTH)
     author = models.ForeignKey(USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     content = models.TextField()
+    # Rendered from the content at save time, so that the pages neither load
+    # nor sanitize the content on each request.
+    excerpt = models.CharField(max_length=POST_EXCERPT_LENGTH, blank=True, editable=False)
+    content_html = models.TextField(blank=True, editable=False)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
     visibility = models.IntegerField(choices=VISIBILITY, default=0)
     status = models.IntegerField(choices=STATUS, default=0)
+    # Denormalized counters, kept up to date whenever likes and comments are
+    # written and fixed by the reconcile_counters command if they ever drift.
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def count_likes(self):
-        try:
-            return self.likes.users.count()
-        except Like.DoesNotExist:
-            return 0
+        return self.like_count
+
+    def render_content(self):
+        self.content_html, text = sanitize(self.content)
+        self.excerpt = Truncator(text).chars(POST_EXCERPT_LENGTH)
+
+    def save(self, *args, **kwargs):
+        self.render_content()
+        # A new slug is drawn in the rare case the random one is already taken.
+        self._meta.get_field('slug').save_unique(self, super(Post, self).save, *args, **kwargs)
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_on']
+        # The indexes serve the filters of the post list, for the anonymous and
+        # the authenticated users, and its ordering on the keys of the cursors.
+        indexes = [
+            models.Index(fields=['status', 'visibility', '-created_on', '-id'], name='blog_post_listing_idx'),
+            models.Index(fields=['status', '-created_on', '-id'], name='blog_post_published_idx'),
+        ]
 
 
 class Comment(models.Model):
     """Blog comment model."""
 
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', db_index=False)
     author = models.ForeignKey(USER_MODEL, on_delete=models.CASCADE, related_name='comments')
     content = models.TextField()
+    content_html = models.TextField(blank=True, editable=False)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
     status = models.IntegerField(choices=STATUS, default=0)
 
+    objects = CommentQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Comment, cls).from_db(db, field_names, values)
+        # The stored post, status and content are remembered to know, when the
+        # comment is saved again, how the comment counters and the search index
+        # of the posts should change.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def render_content(self):
+        self.content_html = sanitize(self.content)[0]
+
+    def save(self, *args, **kwargs):
+        self.render_content()
+        super(Comment, self).save(*args, **kwargs)
+
     def __str__(self):
         return self.content[:200]
 
     class Meta:
         ordering = ['-created_on']
+        # The comments of a post are found through either index, in their
+        # order, the first one serving them by status, and the second one the
+        # drafts of their author. The last one sums up the comments of a post
+        # for the validators of its page.
+        indexes = [
+            models.Index(fields=['post', 'status', 'created_on'], name='blog_comment_thread_idx'),
+            models.Index(fields=['post', 'author', 'status', 'created_on'], name='blog_comment_author_thread_idx'),
+            models.Index(fields=['post', 'updated_on'], name='blog_comment_changed_idx'),
+        ]
 
 
 class Like(models.Model):
-    """Blog like model."""
+    """Blog like model, one row per user and liked post."""
 
-    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='likes')
-    users = models.ManyToManyField(USER_MODEL, related_name='likes')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes', db_index=False)
+    user = models.ForeignKey(USER_MODEL, on_delete=models.CASCADE, related_name='likes', db_index=False)
     created_on = models.DateTimeField(auto_now_add=True)
-    updated_on = models.DateTimeField(auto_now=True)
+
+    objects = LikeQuerySet.as_manager()
 
     def __str__(self):
         return str(self.post)
+
+    class Meta:
+        # The unique constraint also serves the lookups by user, and the likes
+        # of a post are found through the post index.
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='blog_like_user_post_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['post'], name='blog_like_post_idx'),
+        ]
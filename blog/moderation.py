@@ -0,0 +1,100 @@
+"""
+Bulk moderation of the blog posts and comments.
+
+The moderated rows are walked by chunks of primary keys, each chunk being
+written by set-based statements in a short transaction of its own. The side
+effects of the signal receivers of the rows, the counters, the search index
+and the validators of the pages, are applied once per chunk instead of once
+per row.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .likes import forget_liked_posts
+from .models import Post, Comment, Like
+from .search import unindex_comments, unindex_posts
+
+CHUNK_SIZE = getattr(settings, 'BLOG_MODERATION_CHUNK_SIZE', 1000)
+
+COMMENT_ACTIONS = {
+    'publish': {'status': 1},
+    'draft': {'status': 0},
+    'delete': None,
+}
+POST_ACTIONS = {
+    'publish': {'status': 1},
+    'draft': {'status': 0},
+    'hide': {'visibility': 1},
+    'show': {'visibility': 0},
+    'delete': None,
+}
+
+
+def chunks(queryset, fields, chunk_size):
+    """Yield the values of ``fields`` of the rows of ``queryset``, by chunks
+    of primary keys."""
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', *fields)[:chunk_size])
+        if not chunk:
+            break
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+def moderate_comments(queryset, action, chunk_size=CHUNK_SIZE):
+    """Apply the moderation ``action`` to the comments of ``queryset``, and
+    yield the number of comments moderated after each chunk."""
+    values = COMMENT_ACTIONS[action]
+    moderated = 0
+
+    for chunk in chunks(queryset, ('post_id',), chunk_size):
+        pks = [pk for pk, _ in chunk]
+        post_ids = {post_id for _, post_id in chunk}
+        with transaction.atomic(using=queryset.db):
+            comments = Comment.objects.using(queryset.db).filter(pk__in=pks)
+            if values is None:
+                # The comments are deleted without their signals, whose work is
+                # done below for the whole chunk.
+                comments._raw_delete(queryset.db)
+                unindex_comments(pks, queryset.db)
+            else:
+                comments.update(updated_on=timezone.now(), **values)
+            posts = Post.objects.using(queryset.db).filter(pk__in=post_ids)
+            posts.reconcile_counters()
+            posts.touch()
+
+        moderated += len(chunk)
+        yield moderated
+
+
+def moderate_posts(queryset, action, chunk_size=CHUNK_SIZE):
+    """Apply the moderation ``action`` to the posts of ``queryset``, and yield
+    the number of posts moderated after each chunk."""
+    values = POST_ACTIONS[action]
+    moderated = 0
+
+    for chunk in chunks(queryset, (), chunk_size):
+        pks = [pk for pk, in chunk]
+        user_ids = ()
+        with transaction.atomic(using=queryset.db):
+            posts = Post.objects.using(queryset.db).filter(pk__in=pks)
+            if values is None:
+                # The likes and comments are deleted beforehand, without the
+                # signals of the comments and posts, and the index is updated
+                # for the whole chunk.
+                likes = Like.objects.using(queryset.db).filter(post__in=pks)
+                user_ids = set(likes.values_list('user_id', flat=True).distinct())
+                likes.delete()
+                comments = Comment.objects.using(queryset.db).filter(post__in=pks)
+                unindex_comments(comments.values_list('pk', flat=True), queryset.db)
+                comments._raw_delete(queryset.db)
+                posts._raw_delete(queryset.db)
+                unindex_posts(pks, queryset.db)
+            else:
+                posts.update(updated_on=timezone.now(), **values)
+        forget_liked_posts(user_ids)
+
+        moderated += len(chunk)
+        yield moderated
@@ -0,0 +1,180 @@
+import heapq
+from operator import attrgetter
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, 'BLOG_ESTIMATED_COUNT_THRESHOLD', 10000)
+
+
+class InvalidCursor(Exception):
+    """The cursor token is malformed or has been tampered with."""
+
+
+class CursorPage(object):
+    """Page of a keyset paginated queryset."""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return '<CursorPage of {} objects>'.format(len(self))
+
+
+class CursorPaginator(object):
+    """Keyset paginator over a (datetime, pk) ordering.
+
+    The pages are located by comparing the ordering key against the boundary
+    of the previous page instead of using an OFFSET, and the paginator never
+    counts the rows, so any page costs the same single query as the first one.
+    The cursors handed out to the clients are signed, hence opaque.
+
+    ``queryset`` may also be a sequence of disjoint querysets, each one queried
+    for a page and their rows merged, so that a filter no single index serves in
+    order, such as an OR, can be split into ones which are.
+    """
+
+    salt = 'blog.pagination'
+
+    def __init__(self, queryset, per_page, ordering=('-created_on', '-id')):
+        if len(ordering) != 2 or ordering[0].startswith('-') != ordering[1].startswith('-'):
+            raise ImproperlyConfigured(
+                'CursorPaginator requires two ordering fields sharing the same direction.')
+
+        self.querysets = [queryset] if isinstance(queryset, QuerySet) else list(queryset)
+        self.per_page = int(per_page)
+        self.descending = ordering[0].startswith('-')
+        self.fields = tuple(field.lstrip('-') for field in ordering)
+        self.key = attrgetter(*self.fields)
+
+    def encode_cursor(self, instance, direction):
+        value, pk = (getattr(instance, field) for field in self.fields)
+        return signing.dumps([direction, value.isoformat(), pk], salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, value, pk = signing.loads(cursor, salt=self.salt)
+            value = parse_datetime(value)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        if direction not in ('next', 'previous') or value is None or not isinstance(pk, int):
+            raise InvalidCursor(cursor)
+
+        return direction, value, pk
+
+    def get_page(self, cursor=None):
+        """Return the page located by ``cursor``, the first page by default."""
+        if not cursor:
+            direction, boundary = 'next', None
+        else:
+            direction, *boundary = self.decode_cursor(cursor)
+
+        # Walking backwards is done by flipping the ordering and the comparison,
+        # the rows are put back in the expected order once fetched.
+        forwards = direction == 'next'
+        descending = self.descending == forwards
+        querysets = self.querysets
+        if boundary is not None:
+            value, pk = boundary
+            lookup = 'lt' if descending else 'gt'
+            after = (
+                Q(**{'{}__{}'.format(self.fields[0], lookup): value}) |
+                Q(**{self.fields[0]: value, '{}__{}'.format(self.fields[1], lookup): pk})
+            )
+            querysets = [queryset.filter(after) for queryset in querysets]
+        ordering = ['{}{}'.format('-' if descending else '', field) for field in self.fields]
+
+        # One extra row is fetched to know whether there is anything further.
+        rows = [list(queryset.order_by(*ordering)[:self.per_page + 1]) for queryset in querysets]
+        if len(rows) == 1:
+            object_list = rows[0]
+        else:
+            object_list = list(heapq.merge(*rows, key=self.key, reverse=descending))[:self.per_page + 1]
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if not forwards:
+            object_list.reverse()
+
+        if not object_list and not forwards:
+            # Everything newer has vanished since the cursor was handed out.
+            return self.get_page()
+
+        if forwards:
+            has_next, has_previous = has_more, boundary is not None
+        else:
+            has_next, has_previous = boundary is not None, has_more
+        next_cursor = previous_cursor = None
+        if object_list and has_next:
+            next_cursor = self.encode_cursor(object_list[-1], 'next')
+        if object_list and has_previous:
+            previous_cursor = self.encode_cursor(object_list[0], 'previous')
+
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
+
+
+def estimate_count(model, using='default'):
+    """Return an estimate of the number of rows of the table of ``model``,
+    read from the statistics of the database, or None if there are none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(table)])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # The highest rowid is read from the end of the table, and only
+            # overestimates the rows by the deleted ones.
+            cursor.execute('SELECT MAX(_rowid_) FROM {}'.format(connection.ops.quote_name(table)))
+        else:
+            return None
+        row = cursor.fetchone()
+
+    # PostgreSQL has no estimate for the tables never analyzed.
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator estimating the number of rows of the large unfiltered tables
+    instead of counting them.
+
+    The rows of the filtered querysets, or of the tables estimated below
+    ESTIMATED_COUNT_THRESHOLD rows, are still counted.
+    """
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet) and not self.object_list.query.where:
+            estimate = estimate_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super(EstimatedCountPaginator, self).count
@@ -0,0 +1,120 @@
+"""
+Allowlist HTML sanitizer of the posts and comments.
+
+The content written by the users is parsed once, when saved, into the HTML
+displayed by the pages and the plain text the excerpts are cut from. Only the
+allowed tags and attributes are kept, the other tags being dropped while their
+text is kept and escaped, except for the scripts and styles which are dropped
+along with their content.
+"""
+import re
+from html import escape
+from html.parser import HTMLParser
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'del', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr',
+    'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span', 'strong', 'sub', 'sup', 'u', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'http', 'https', 'mailto'}
+VOID_TAGS = {'br', 'hr', 'img'}
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template'}
+# The tags separating the words of the plain text.
+BLOCK_TAGS = {
+    'blockquote', 'br', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'ol', 'p', 'pre', 'table',
+    'td', 'th', 'tr', 'ul',
+}
+
+# The browsers ignore the control characters and spaces within a URL scheme.
+IGNORED_URL_CHARACTERS = re.compile(r'[\x00-\x20\x7f]+')
+URL_SCHEME = re.compile(r'^([^/?#]*):')
+
+
+def is_safe_url(url):
+    scheme = URL_SCHEME.match(IGNORED_URL_CHARACTERS.sub('', url))
+    return scheme is None or scheme.group(1).lower() in ALLOWED_SCHEMES
+
+
+class Sanitizer(HTMLParser):
+    """Parser writing out the allowed markup of a document, and its text."""
+
+    def __init__(self):
+        super(Sanitizer, self).__init__(convert_charrefs=True)
+        self.html = []
+        self.text = []
+        self.open_tags = []
+        self.dropping = None
+
+    def handle_starttag(self, tag, attrs):
+        self.start_tag(tag, attrs, closed=False)
+
+    def handle_startendtag(self, tag, attrs):
+        self.start_tag(tag, attrs, closed=True)
+
+    def start_tag(self, tag, attrs, closed):
+        if self.dropping:
+            return
+        if tag in DROPPED_TAGS:
+            if not closed:
+                self.dropping = tag
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+
+        allowed = ALLOWED_ATTRIBUTES.get(tag, ())
+        html = [tag]
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not is_safe_url(value):
+                continue
+            html.append('{}="{}"'.format(name, escape(value)))
+        if tag == 'a':
+            html.append('rel="nofollow"')
+        self.html.append('<{}>'.format(' '.join(html)))
+        if tag not in VOID_TAGS and not closed:
+            self.open_tags.append(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropping:
+            if tag == self.dropping:
+                self.dropping = None
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        # The tags left open within the closed one are closed along with it,
+        # and the stray end tags are dropped.
+        if tag in self.open_tags:
+            while self.open_tags:
+                open_tag = self.open_tags.pop()
+                self.html.append('</{}>'.format(open_tag))
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.html.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def close(self):
+        super(Sanitizer, self).close()
+        while self.open_tags:
+            self.html.append('</{}>'.format(self.open_tags.pop()))
+
+
+def sanitize(content):
+    """Return the sanitized HTML of ``content`` and its plain text, the
+    whitespaces of which are collapsed."""
+    sanitizer = Sanitizer()
+    sanitizer.feed(content)
+    sanitizer.close()
+
+    return ''.join(sanitizer.html), ' '.join(''.join(sanitizer.text).split())
@@ -0,0 +1,288 @@
+"""
+Full-text search index of the blog posts.
+
+Each post is indexed as a document made of its title and the text of its
+content, the title weighing the most, and each comment as a document of its
+own, so that writing a comment only indexes that comment. A post matches when
+all the words are found in the post itself or in one of its published comments,
+the matches in the comments weighing less. The index is made of FTS5 tables on
+SQLite and of tables of tsvectors under GIN indexes on PostgreSQL, all created
+by the migrations, and is kept up to date by the signal receivers of the posts
+and comments. The other databases fall back to unranked substring searches of
+the posts.
+
+The status and visibility of the posts and the status of the comments are not
+indexed but joined, so that moderating them never touches the index. The
+searches may be restricted to the posts of a status and visibility, which are
+filtered within the query of the index, before its results are limited.
+
+The rebuild_search_index command indexes the posts and comments written before
+the index, or in bulk.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+
+SEARCH_CONFIG = getattr(settings, 'BLOG_SEARCH_CONFIG', 'english')
+SEARCH_MAX_RESULTS = getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 500)
+
+TABLE = 'blog_post_search'
+COMMENT_TABLE = 'blog_comment_search'
+WORD = re.compile(r'\w+')
+FILTERS = ('status', 'visibility')
+DELETE_BATCH_SIZE = 500
+
+
+def filter_clause(filters):
+    """Return the SQL conditions on the posts, aliased p, of the ``filters``,
+    and their parameters."""
+    fields = sorted(filters)
+    return ''.join(' AND p.{} = %s'.format(field) for field in fields), [filters[field] for field in fields]
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def limit_clause(limit):
+    """Return the LIMIT clause of the searches, and its parameters, none for
+    the unlimited searches."""
+    return (' LIMIT %s', [limit]) if limit is not None else ('', [])
+
+
+class SearchBackend(object):
+    """Search index of the databases without full-text search."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index(self, documents):
+        pass
+
+    def delete(self, post_ids):
+        pass
+
+    def index_comments(self, documents):
+        pass
+
+    def delete_comments(self, comment_ids):
+        pass
+
+    def search(self, words, limit, filters):
+        from .models import Post
+
+        posts = Post.objects.using(self.connection.alias).filter(**filters)
+        for word in words:
+            posts = posts.filter(Q(title__icontains=word) | Q(content__icontains=word))
+        return list(posts.values_list('pk', flat=True)[:limit])
+
+    def search_comments(self, words, limit):
+        from .models import Comment
+
+        comments = Comment.objects.using(self.connection.alias)
+        for word in words:
+            comments = comments.filter(content__icontains=word)
+        return list(comments.values_list('pk', flat=True)[:limit])
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """Search index stored in FTS5 tables, ranked by BM25."""
+
+    def index(self, documents):
+        self.delete([document[0] for document in documents])
+        with self.connection.cursor() as cursor:
+            cursor.executemany('INSERT INTO {} (rowid, title, body) VALUES (%s, %s, %s)'.format(TABLE), documents)
+
+    def delete(self, post_ids):
+        if post_ids:
+            with self.connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {} WHERE rowid IN ({})'.format(TABLE, placeholders(post_ids)),
+                               list(post_ids))
+
+    def index_comments(self, documents):
+        self.delete_comments([document[0] for document in documents])
+        with self.connection.cursor() as cursor:
+            cursor.executemany('INSERT INTO {} (rowid, content) VALUES (%s, %s)'.format(COMMENT_TABLE), documents)
+
+    def delete_comments(self, comment_ids):
+        # The comments of the deleted posts may outnumber the parameters of a
+        # single statement.
+        comment_ids = list(comment_ids)
+        with self.connection.cursor() as cursor:
+            for i in range(0, len(comment_ids), DELETE_BATCH_SIZE):
+                batch = comment_ids[i:i + DELETE_BATCH_SIZE]
+                cursor.execute('DELETE FROM {} WHERE rowid IN ({})'.format(COMMENT_TABLE, placeholders(batch)), batch)
+
+    def search(self, words, limit, filters):
+        # The words are quoted, so that they are never read as the operators
+        # of the FTS5 query syntax. The matches are joined to the posts and
+        # comments by CROSS JOIN, which keeps the index as the outer loop
+        # rather than matching every post of the status filtered on.
+        query = ' '.join('"{}"'.format(word) for word in words)
+        clause, params = filter_clause(filters)
+        limit, limit_params = limit_clause(limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT post_id FROM ('
+                'SELECT {0}.rowid AS post_id, bm25({0}, 10.0, 1.0) AS rank '
+                'FROM {0} CROSS JOIN blog_post p WHERE {0} MATCH %s AND p.id = {0}.rowid{2} '
+                'UNION ALL '
+                'SELECT c.post_id, 0.5 * bm25({1}) FROM {1} CROSS JOIN blog_comment c CROSS JOIN blog_post p '
+                'WHERE {1} MATCH %s AND c.id = {1}.rowid AND c.status = 1 AND p.id = c.post_id{2}'
+                ') GROUP BY post_id ORDER BY MIN(rank), post_id{3}'.format(TABLE, COMMENT_TABLE, clause, limit),
+                [query, *params, query, *params, *limit_params],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_comments(self, words, limit):
+        query = ' '.join('"{}"'.format(word) for word in words)
+        limit, limit_params = limit_clause(limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM {0} WHERE {0} MATCH %s ORDER BY bm25({0}){1}'.format(COMMENT_TABLE, limit),
+                [query, *limit_params],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """Search index stored as tsvectors under GIN indexes, ranked by
+    ts_rank."""
+
+    def index(self, documents):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO {} (post_id, document) VALUES (%s, '
+                "setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+                "setweight(to_tsvector(%s::regconfig, %s), 'B')) "
+                'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document'.format(TABLE),
+                [(post_id, SEARCH_CONFIG, title, SEARCH_CONFIG, body) for post_id, title, body in documents],
+            )
+
+    def delete(self, post_ids):
+        if post_ids:
+            with self.connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {} WHERE post_id = ANY(%s)'.format(TABLE), [list(post_ids)])
+
+    def index_comments(self, documents):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO {} (comment_id, document) VALUES (%s, setweight(to_tsvector(%s::regconfig, %s), 'C')) "
+                'ON CONFLICT (comment_id) DO UPDATE SET document = EXCLUDED.document'.format(COMMENT_TABLE),
+                [(comment_id, SEARCH_CONFIG, content) for comment_id, content in documents],
+            )
+
+    def delete_comments(self, comment_ids):
+        if comment_ids:
+            with self.connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {} WHERE comment_id = ANY(%s)'.format(COMMENT_TABLE), [list(comment_ids)])
+
+    def search(self, words, limit, filters):
+        clause, params = filter_clause(filters)
+        limit, limit_params = limit_clause(limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'WITH q AS (SELECT plainto_tsquery(%s::regconfig, %s) AS query) '
+                'SELECT post_id FROM ('
+                'SELECT s.post_id, ts_rank(s.document, q.query) AS rank '
+                'FROM {0} s INNER JOIN blog_post p ON p.id = s.post_id, q WHERE s.document @@ q.query{2} '
+                'UNION ALL '
+                'SELECT c.post_id, ts_rank(s.document, q.query) FROM {1} s '
+                'INNER JOIN blog_comment c ON c.id = s.comment_id INNER JOIN blog_post p ON p.id = c.post_id, q '
+                'WHERE s.document @@ q.query AND c.status = 1{2}'
+                ') results GROUP BY post_id ORDER BY MAX(rank) DESC, post_id{3}'.format(
+                    TABLE, COMMENT_TABLE, clause, limit),
+                [SEARCH_CONFIG, ' '.join(words), *params, *params, *limit_params],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_comments(self, words, limit):
+        limit, limit_params = limit_clause(limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT comment_id FROM {}, plainto_tsquery(%s::regconfig, %s) query WHERE document @@ query '
+                'ORDER BY ts_rank(document, query) DESC{}'.format(COMMENT_TABLE, limit),
+                [SEARCH_CONFIG, ' '.join(words), *limit_params],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_backend(using='default'):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, SearchBackend)(connection)
+
+
+def documents(post_ids, using='default'):
+    """Return the documents of the posts to index, as (post id, title, body)
+    tuples."""
+    from .models import Post
+    from .sanitizer import sanitize
+
+    return [
+        (post_id, title, sanitize(content)[1])
+        for post_id, title, content in Post.objects.using(using).filter(pk__in=post_ids)
+        .values_list('pk', 'title', 'content').iterator()
+    ]
+
+
+def index_posts(post_ids, using='default'):
+    """Index the posts again, after they changed."""
+    post_ids = set(post_ids)
+    backend = get_backend(using)
+    indexed = documents(post_ids, using)
+    backend.index(indexed)
+    # The posts deleted meanwhile are dropped from the index.
+    backend.delete(post_ids.difference(document[0] for document in indexed))
+
+
+def unindex_posts(post_ids, using='default'):
+    """Drop the deleted posts from the index."""
+    get_backend(using).delete(set(post_ids))
+
+
+def index_comments(comments, using='default'):
+    """Index the comments, whatever their status, after their content
+    changed."""
+    from .sanitizer import sanitize
+
+    get_backend(using).index_comments([(comment.pk, sanitize(comment.content)[1]) for comment in comments])
+
+
+def unindex_comments(comment_ids, using='default'):
+    """Drop the deleted comments from the index."""
+    get_backend(using).delete_comments(set(comment_ids))
+
+
+def search_post_ids(query, limit=SEARCH_MAX_RESULTS, using='default', **filters):
+    """Return the identifiers of the posts matching all the words of
+    ``query``, the most relevant first.
+
+    The posts may be filtered on their status and visibility, given as keyword
+    arguments, before the results are limited, to none of them if ``limit`` is
+    None.
+    """
+    unknown = set(filters).difference(FILTERS)
+    if unknown:
+        raise TypeError('Unexpected search filters: {}.'.format(', '.join(sorted(unknown))))
+    words = WORD.findall(query)
+    if not words:
+        return []
+    return get_backend(using).search(words, limit, filters)
+
+
+def search_comment_ids(query, limit=SEARCH_MAX_RESULTS, using='default'):
+    """Return the identifiers of the comments of any status matching all the
+    words of ``query``, the most relevant first, all of them if ``limit`` is
+    None."""
+    words = WORD.findall(query)
+    if not words:
+        return []
+    return get_backend(using).search_comments(words, limit)
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Post, Comment
+from .search import index_comments, index_posts, unindex_comments, unindex_posts
+
+# The fields of the users shown as the authors of the posts and comments.
+AUTHOR_NAME_FIELDS = ('title', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, using, **kwargs):
+    """Update the comment counters of the posts and the search index of the
+    comment when a comment is saved."""
+    loaded = getattr(instance, '_loaded_values', None)
+    if created:
+        old_post_id, old_status, old_content = None, None, None
+    elif loaded is not None:
+        old_post_id, old_status, old_content = loaded.get('post_id'), loaded.get('status'), loaded.get('content')
+    else:
+        # Nothing is known about the stored comment, the counter is recomputed.
+        Post.objects.filter(pk=instance.post_id).reconcile_counters()
+        index_comments([instance], using)
+        return
+
+    if old_status == 1:
+        Post.objects.filter(pk=old_post_id).shift_counter('comment_count', -1)
+    elif old_post_id not in (None, instance.post_id):
+        # The page of the post the draft is moved from changes as well.
+        Post.objects.filter(pk=old_post_id).touch()
+    if instance.status == 1:
+        Post.objects.filter(pk=instance.post_id).shift_counter('comment_count', 1)
+    instance._loaded_values = {'post_id': instance.post_id, 'status': instance.status, 'content': instance.content}
+
+    # The post and the status of the comment are joined by the searches, only
+    # its content is indexed.
+    if instance.content != old_content:
+        index_comments([instance], using)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, using, **kwargs):
+    """Update the comment counter of the post and the search index when a
+    comment is deleted."""
+    if instance.status == 1:
+        Post.objects.filter(pk=instance.post_id).shift_counter('comment_count', -1)
+    else:
+        Post.objects.filter(pk=instance.post_id).touch()
+    unindex_comments([instance.pk], using)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def touch_renamed_author(sender, instance, raw, using, update_fields, **kwargs):
+    """Touch the posts written or commented by a user whose name changes, so
+    that the validators of their pages change."""
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(AUTHOR_NAME_FIELDS).intersection(update_fields):
+        return
+
+    stored = sender._default_manager.using(using).filter(pk=instance.pk).values_list(*AUTHOR_NAME_FIELDS).first()
+    if stored is None or stored == tuple(getattr(instance, field) for field in AUTHOR_NAME_FIELDS):
+        return
+    Post.objects.using(using).filter(
+        Q(author=instance.pk) | Q(pk__in=Comment.objects.filter(author=instance.pk).values('post_id'))
+    ).touch()
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, using, **kwargs):
+    """Index a post again when it is saved."""
+    index_posts([instance.pk], using)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, using, **kwargs):
+    """Drop a post from the search index when it is deleted."""
+    unindex_posts([instance.pk], using)
@@ -1,3 +1,1099 @@
-from django.test import TestCase
+import json
+import re
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import FieldError, ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import cache as page_cache, export, likes, pagination, views
+from .fields import RandomSlugField
+from .models import Post, Comment, Like
+from .moderation import moderate_comments, moderate_posts
+from .pagination import CursorPaginator, InvalidCursor
+from .sanitizer import sanitize
+from .search import search_comment_ids, search_post_ids
+from .views import POSTS_PER_PAGE
+
+# A full scan is a SQLite "SCAN <table>" step not going through any index, and
+# a sort a "USE TEMP B-TREE" step ordering the rows no index returns in order.
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')
+SQLITE_SORT = re.compile(r'^USE TEMP B-TREE ')
+
+
+class QueryPlanTests(TestCase):
+    """Query plans of the views serving the hot paths.
+
+    The queries run by the views are captured and explained, any of them
+    scanning a whole table or sorting its rows failing the test.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        UserModel = get_user_model()
+        cls.author = UserModel.objects.create_user('author@example.com', 'password', first_name='A', last_name='A')
+        cls.reader = UserModel.objects.create_user('reader@example.com', 'password', first_name='R', last_name='R')
+        # Half of the posts are published and public, hence the post list has
+        # three full pages for everybody.
+        cls.posts = [
+            Post.objects.create(title='Post {}'.format(i), author=cls.author, content='Content {}'.format(i),
+                                status=i % 4 != 0, visibility=i % 3 == 0)
+            for i in range(6 * POSTS_PER_PAGE)
+        ]
+        cls.post = cls.posts[1]
+        for i in range(10):
+            Comment.objects.create(post=cls.post, author=(cls.author, cls.reader)[i % 2],
+                                   content='Comment {}'.format(i), status=i % 5 != 0)
+        Like.objects.create(post=cls.post, user=cls.author)
+
+    def setUp(self):
+        # The cached pages and liked posts would spare the queries.
+        caches['default'].clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # The tables of the tests are small enough for PostgreSQL to
+                # prefer sequential scans, unless told otherwise.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN (FORMAT JSON) {}'.format(sql))
+                return [
+                    '{} on {}'.format(node['Node Type'], node.get('Relation Name'))
+                    for node in self.plan_nodes(json.loads(cursor.fetchone()[0])[0]['Plan'])
+                    if node['Node Type'] in ('Seq Scan', 'Sort')
+                ]
+            cursor.execute('EXPLAIN QUERY PLAN {}'.format(sql))
+            return [
+                row[-1] for row in cursor.fetchall()
+                if SQLITE_FULL_SCAN.match(row[-1]) or SQLITE_SORT.match(row[-1])
+            ]
+
+    def plan_nodes(self, plan):
+        yield plan
+        for child in plan.get('Plans', ()):
+            yield from self.plan_nodes(child)
+
+    def assertNoFullScan(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertLess(response.status_code, 400)
+
+        explained = [query['sql'] for query in queries if query['sql'].startswith(('SELECT', 'UPDATE', 'DELETE'))]
+        self.assertTrue(explained)
+        for sql in explained:
+            with self.subTest(sql=sql):
+                self.assertEqual(self.explain(sql), [])
+
+    def test_post_list_anonymous(self):
+        self.assertNoFullScan(lambda: self.client.get(reverse('blog:home')))
+
+    def test_post_list_authenticated(self):
+        self.client.force_login(self.reader)
+        self.assertNoFullScan(lambda: self.client.get(reverse('blog:home')))
+
+    def test_post_list_next_page(self):
+        response = self.client.get(reverse('blog:home'))
+        next_page_url = response.context['next_page_url']
+        self.assertIsNotNone(next_page_url)
+        self.assertNoFullScan(lambda: self.client.get(reverse('blog:home') + next_page_url))
+
+    def test_post_list_columns(self):
+        # The list pages only read the excerpts, never the bodies of the posts.
+        for url in (reverse('blog:home'), '{}?q=Content'.format(reverse('blog:search'))):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                posts = [query['sql'] for query in queries if query['sql'].startswith('SELECT "blog_post"."id"')]
+                self.assertTrue(posts)
+                for sql in posts:
+                    self.assertNotIn('"blog_post"."content"', sql)
+                    self.assertNotIn('"blog_post"."content_html"', sql)
+
+    def test_post_details_anonymous(self):
+        self.assertNoFullScan(lambda: self.client.get(reverse('blog:details', args=[self.post.slug])))
+
+    def test_post_details_authenticated(self):
+        self.client.force_login(self.reader)
+        self.assertNoFullScan(lambda: self.client.get(reverse('blog:details', args=[self.post.slug])))
+
+    def test_post_details_staff(self):
+        get_user_model().objects.filter(pk=self.reader.pk).update(is_staff=True)
+        self.client.force_login(self.reader)
+        self.assertNoFullScan(lambda: self.client.get(reverse('blog:details', args=[self.post.slug])))
+
+    def test_like(self):
+        self.client.force_login(self.reader)
+        url = reverse('blog:like', kwargs={'post_id': self.post.pk})
+        # Both the like and the unlike are explained.
+        self.assertNoFullScan(lambda: self.client.post(url, HTTP_ACCEPT='application/json'))
+        self.assertNoFullScan(lambda: self.client.post(url, HTTP_ACCEPT='application/json'))
+
+    def test_like_writes_only(self):
+        self.client.force_login(self.reader)
+        url = reverse('blog:like', kwargs={'post_id': self.post.pk})
+        # The likes of the user are never read to toggle one of them.
+        like_count = Post.objects.get(pk=self.post.pk).like_count
+        for liked, like_count in ((True, like_count + 1), (False, like_count)):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.json(), {'post': self.post.pk, 'liked': liked, 'like_count': like_count})
+            self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "blog_like"')])
+
+
+class CursorPaginatorTests(TestCase):
+    """Keyset pagination of the posts, on the (created_on, id) ordering."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user('author@example.com', 'password', first_name='A', last_name='A')
+        for i in range(8):
+            Post.objects.create(title='Post {}'.format(i), author=author, content='Content', status=i % 2)
+        # Half of the posts share their creation time, so that they are only
+        # ordered by their identifiers.
+        posts = list(Post.objects.order_by('id'))
+        Post.objects.filter(pk__in=[post.pk for post in posts[2:6]]).update(created_on=posts[2].created_on)
+        cls.ordered = list(Post.objects.order_by('-created_on', '-id').values_list('pk', flat=True))
+
+    def walk(self, paginator):
+        """Return the identifiers of the posts of every page, walking forwards
+        to the last page and then backwards to the first one."""
+        forwards, backwards = [], []
+        page = paginator.get_page()
+        forwards.append([post.pk for post in page])
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            forwards.append([post.pk for post in page])
+        backwards.append([post.pk for post in page])
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            backwards.append([post.pk for post in page])
+        return forwards, backwards[::-1]
+
+    def test_pages(self):
+        forwards, backwards = self.walk(CursorPaginator(Post.objects.all(), 3))
+        self.assertEqual(forwards, [self.ordered[0:3], self.ordered[3:6], self.ordered[6:8]])
+        self.assertEqual(backwards, forwards)
+
+    def test_merged_querysets(self):
+        paginator = CursorPaginator([Post.objects.filter(status=0), Post.objects.filter(status=1)], 3)
+        forwards, backwards = self.walk(paginator)
+        self.assertEqual(forwards, [self.ordered[0:3], self.ordered[3:6], self.ordered[6:8]])
+        self.assertEqual(backwards, forwards)
+
+    def test_cursor_round_trip(self):
+        paginator = CursorPaginator(Post.objects.all(), 3)
+        post = Post.objects.get(pk=self.ordered[3])
+        cursor = paginator.encode_cursor(post, 'next')
+        self.assertEqual(paginator.decode_cursor(cursor), ('next', post.created_on, post.pk))
+        self.assertEqual([post.pk for post in paginator.get_page(cursor)], self.ordered[4:7])
+
+    def test_invalid_cursors(self):
+        paginator = CursorPaginator(Post.objects.all(), 3)
+        post = Post.objects.get(pk=self.ordered[3])
+        cursor = paginator.encode_cursor(post, 'next')
+        tampered = cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')
+        for invalid in (
+            tampered, 'garbage', cursor[:len(cursor) // 2],
+            # Signed cursors, but not by the paginator or not well formed.
+            signing.dumps(['next', post.created_on.isoformat(), post.pk]),
+            signing.dumps(['sideways', post.created_on.isoformat(), post.pk], salt=paginator.salt),
+            signing.dumps(['next', 'yesterday', post.pk], salt=paginator.salt),
+            signing.dumps(['next', post.created_on.isoformat(), str(post.pk)], salt=paginator.salt),
+            signing.dumps(['next', post.created_on.isoformat()], salt=paginator.salt),
+        ):
+            with self.subTest(cursor=invalid):
+                with self.assertRaises(InvalidCursor):
+                    paginator.get_page(invalid)
+
+    def test_invalid_cursor_view(self):
+        response = self.client.get(reverse('blog:home'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    """Validators of the post list and post details pages.
+
+    The validators are derived from the database, hence the cache is cleared
+    after every write, as if the write came from another process.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        UserModel = get_user_model()
+        cls.author = UserModel.objects.create_user('author@example.com', 'password', first_name='A', last_name='A')
+        cls.reader = UserModel.objects.create_user('reader@example.com', 'password', first_name='R', last_name='R')
+        cls.post = Post.objects.create(title='Post', author=cls.author, content='Content', status=1)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.urls = [reverse('blog:home'), reverse('blog:details', args=[self.post.slug])]
+        self.etags = [self.client.get(url)['ETag'] for url in self.urls]
+
+    def assertModified(self, modified=True):
+        caches['default'].clear()
+        for url, etag in zip(self.urls, self.etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200 if modified else 304)
+
+    def test_not_modified(self):
+        self.assertModified(False)
+        response = self.client.get(self.urls[1])
+        response = self.client.get(self.urls[1], HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment(self):
+        comment = Comment.objects.create(post=self.post, author=self.reader, content='Comment', status=1)
+        self.assertModified()
+        self.etags = [self.client.get(url)['ETag'] for url in self.urls]
+        comment.delete()
+        self.assertModified()
+
+    def test_like(self):
+        Like.objects.toggle(self.reader, self.post.pk)
+        self.assertModified()
+
+    def test_author_renamed(self):
+        self.author.last_name = 'B'
+        self.author.save()
+        self.assertModified()
+
+
+class SearchTests(TestCase):
+    """Full-text search of the posts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(
+            'author@example.com', 'password', first_name='A', last_name='A')
+        cls.drafts = [
+            Post.objects.create(title='Needle draft {}'.format(i), author=cls.author, content='Content', status=0)
+            for i in range(3)
+        ]
+        cls.hidden = Post.objects.create(title='Needle hidden', author=cls.author, content='Content', status=1,
+                                         visibility=1)
+        cls.public = Post.objects.create(title='Public', author=cls.author, content='A needle', status=1)
+
+    def test_filters_before_limit(self):
+        self.assertEqual(search_post_ids('needle', limit=1, status=1, visibility=0), [self.public.pk])
+        self.assertEqual(search_post_ids('needle', limit=2, status=1), [self.hidden.pk, self.public.pk])
+        self.assertEqual(len(search_post_ids('needle', limit=2)), 2)
+
+    def test_view(self):
+        response = self.client.get(reverse('blog:search'), {'q': 'needle'})
+        self.assertEqual(list(response.context['posts']), [self.public])
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('blog:search'), {'q': 'needle'})
+        self.assertEqual(list(response.context['posts']), [self.hidden, self.public])
+
+    def test_comments(self):
+        comment = Comment.objects.create(post=self.drafts[0], author=self.author, content='A <b>haystack</b>', status=1)
+        Comment.objects.create(post=self.public, author=self.author, content='A haystack', status=0)
+        self.assertEqual(search_post_ids('haystack'), [self.drafts[0].pk])
+        self.assertEqual(search_post_ids('haystack', status=1), [])
+
+        comment.post = self.public
+        comment.save()
+        self.assertEqual(search_post_ids('haystack', status=1), [self.public.pk])
+        comment.content = 'A straw'
+        comment.save()
+        self.assertEqual(search_post_ids('haystack'), [])
+        self.assertEqual(search_post_ids('straw'), [self.public.pk])
+        comment.delete()
+        self.assertEqual(search_post_ids('straw'), [])
+
+    def test_comment_admin(self):
+        draft = Comment.objects.create(post=self.public, author=self.author, content='A haystack', status=0)
+        Comment.objects.create(post=self.public, author=self.author, content='A straw', status=1)
+        admin = get_user_model().objects.create_superuser('admin@example.com', 'password', first_name='S',
+                                                          last_name='S', title=0)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:blog_comment_changelist'), {'q': 'haystack'})
+        self.assertEqual(list(response.context['cl'].result_list), [draft])
+        response = self.client.get(reverse('admin:blog_comment_changelist'), {'q': self.public.slug})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+
+class SanitizerTests(SimpleTestCase):
+    """Allowlist sanitizer of the posts and comments."""
+
+    def assertSanitized(self, content, html, text=None):
+        sanitized = sanitize(content)
+        self.assertEqual(sanitized[0], html)
+        if text is not None:
+            self.assertEqual(sanitized[1], text)
+
+    def test_scripts_and_styles(self):
+        self.assertSanitized('<p>a<script>alert(1)</script>b</p><style>p {color: red}</style>c', '<p>ab</p>c', 'ab c')
+        self.assertSanitized('<SCRIPT type="text/javascript">alert(1)</SCRIPT>x<script/>y', 'xy')
+        self.assertSanitized('<iframe src="https://example.com/">z</iframe>w', 'w')
+
+    def test_event_handlers(self):
+        self.assertSanitized('<a href="https://example.com/" onclick="evil()" ONMOUSEOVER="evil()">l</a>',
+                             '<a href="https://example.com/" rel="nofollow">l</a>')
+        self.assertSanitized('<img src="/i.png" onerror="evil()"><b onclick=evil()>t</b>', '<img src="/i.png"><b>t</b>')
+
+    def test_unsafe_urls(self):
+        for url in (
+            'javascript:alert(1)', 'JaVaScRiPt:alert(1)', ' java\tscript:alert(1)', '&#106;avascript:alert(1)',
+            '&#x6A;avascript&colon;alert(1)', 'javascript&#58;alert(1)', 'java&#x09;script:alert(1)',
+            'data:text/html,<script>alert(1)</script>', 'DATA:text/html;base64,PHNjcmlwdD4=', 'vbscript:evil()',
+        ):
+            with self.subTest(url=url):
+                self.assertSanitized('<a href="{}">l</a>'.format(url), '<a rel="nofollow">l</a>')
+        self.assertSanitized('<img src="data:image/svg+xml;base64,PHN2Zz4=" alt="x">', '<img alt="x">')
+
+    def test_unclosed_tags(self):
+        self.assertSanitized('<p><b>bold <i>both</b> none</i> <u>under',
+                             '<p><b>bold <i>both</i></b> none <u>under</u></p>', 'bold both none under')
+        self.assertSanitized('<a href="javascript:alert(1)"', '&lt;a href="javascript:alert(1)"')
+
+    def test_allowed_markup(self):
+        content = (
+            '<p>Hi <a href="https://example.com/?a=1&amp;b=2" title="T">there</a><br>'
+            '<img src="/x.png" alt="X" width="10"></p><ul><li>one</li></ul><pre><code>x = 1</code></pre>'
+            '<a href="mailto:a@example.com">m</a><a href="/relative">r</a>'
+        )
+        self.assertSanitized(content, (
+            '<p>Hi <a href="https://example.com/?a=1&amp;b=2" title="T" rel="nofollow">there</a><br>'
+            '<img src="/x.png" alt="X" width="10"></p><ul><li>one</li></ul><pre><code>x = 1</code></pre>'
+            '<a href="mailto:a@example.com" rel="nofollow">m</a><a href="/relative" rel="nofollow">r</a>'
+        ), 'Hi there one x = 1 mr')
+        self.assertSanitized('<p>1 < 2 & "q"</p><div class="x">d</div>', '<p>1 &lt; 2 &amp; "q"</p>d', '1 < 2 & "q" d')
+
+
+@mock.patch.object(likes, 'WRITE_BEHIND', True)
+class WriteBehindLikeTests(TestCase):
+    """Like toggles buffered in the cache, and their flush."""
+
+    @classmethod
+    def setUpTestData(cls):
+        UserModel = get_user_model()
+        cls.author = UserModel.objects.create_user('author@example.com', 'password', first_name='A', last_name='A')
+        cls.reader = UserModel.objects.create_user('reader@example.com', 'password', first_name='R', last_name='R')
+        cls.posts = [
+            Post.objects.create(title='Post {}'.format(i), author=cls.author, content='Content', status=1)
+            for i in range(3)
+        ]
+        cls.post = cls.posts[0]
+
+    def setUp(self):
+        caches[likes.LIKE_CACHE].clear()
+
+    def user(self, user):
+        # A fresh instance per request, as the liked posts are memoized on it.
+        return get_user_model().objects.get(pk=user.pk)
+
+    def like_count(self, post):
+        post = Post.objects.get(pk=post.pk)
+        return likes.merge_pending_likes(self.user(self.reader), [post])[0].like_count
+
+    def test_toggle(self):
+        self.assertTrue(likes.toggle_like(self.user(self.reader), self.post.pk))
+        # Nothing is written until the flush, but the user sees the like.
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).like_count, 0)
+        self.assertIn(self.post.pk, likes.liked_posts(self.user(self.reader)))
+        self.assertEqual(self.like_count(self.post), 1)
+
+        self.assertFalse(likes.toggle_like(self.user(self.reader), self.post.pk))
+        self.assertNotIn(self.post.pk, likes.liked_posts(self.user(self.reader)))
+        self.assertEqual(self.like_count(self.post), 0)
+
+    def test_flush(self):
+        likes.toggle_like(self.user(self.reader), self.post.pk)
+        likes.toggle_like(self.user(self.author), self.post.pk)
+        self.assertEqual(likes.flush_pending_likes(), 2)
+
+        self.assertEqual(set(Like.objects.values_list('user', 'post')),
+                         {(self.reader.pk, self.post.pk), (self.author.pk, self.post.pk)})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).like_count, 2)
+        # The flushed states are no longer merged into the stored counters.
+        self.assertEqual(self.like_count(self.post), 2)
+        self.assertEqual(likes.flush_pending_likes(), 0)
+
+        self.assertFalse(likes.toggle_like(self.user(self.reader), self.post.pk))
+        self.assertEqual(self.like_count(self.post), 1)
+        self.assertEqual(likes.flush_pending_likes(), 1)
+        self.assertEqual(list(Like.objects.values_list('user', flat=True)), [self.author.pk])
+        self.assertEqual(Post.objects.get(pk=self.post.pk).like_count, 1)
+
+    def test_coalescing(self):
+        for _ in range(3):
+            likes.toggle_like(self.user(self.reader), self.post.pk)
+        for _ in range(2):
+            likes.toggle_like(self.user(self.reader), self.posts[1].pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(likes.flush_pending_likes(), 5)
+        # The toggles of each (user, post) pair are written once, the last one
+        # winning.
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(list(Like.objects.values_list('user', 'post')), [(self.reader.pk, self.post.pk)])
+        self.assertEqual([self.like_count(post) for post in self.posts], [1, 0, 0])
+
+    def test_stale_liked_posts(self):
+        # The liked posts of a request read before the toggles of a concurrent
+        # one are read again, and so is the state of the post.
+        first, second = self.user(self.reader), self.user(self.reader)
+        likes.liked_posts(first)
+        self.assertTrue(likes.toggle_like(second, self.post.pk))
+        self.assertTrue(likes.toggle_like(first, self.posts[1].pk))
+        self.assertEqual(list(likes.liked_posts(self.user(self.reader))), [self.post.pk, self.posts[1].pk])
+        self.assertFalse(likes.toggle_like(second, self.post.pk))
+        self.assertEqual(list(likes.liked_posts(self.user(self.reader))), [self.posts[1].pk])
+
+        likes.flush_pending_likes()
+        self.assertEqual(list(Like.objects.values_list('post', flat=True)), [self.posts[1].pk])
+
+    def test_toggle_lock(self):
+        cache = caches[likes.LIKE_CACHE]
+        lock_key = likes._toggle_lock_key(self.reader.pk)
+        cache.add(lock_key, True)
+        with mock.patch.object(likes, 'TOGGLE_LOCK_TIMEOUT', 0.1), mock.patch.object(likes.time, 'sleep') as sleep:
+            # The toggle waits for the lock, and is only applied once its
+            # holder is given up on.
+            self.assertTrue(likes.toggle_like(self.user(self.reader), self.post.pk))
+        self.assertTrue(sleep.called)
+        # The lock of the other toggle is left alone.
+        self.assertTrue(cache.get(lock_key))
+
+        cache.delete(lock_key)
+        self.assertFalse(likes.toggle_like(self.user(self.reader), self.post.pk))
+        self.assertIsNone(cache.get(lock_key))
+
+    def test_gap(self):
+        for post in self.posts:
+            likes.toggle_like(self.user(self.reader), post.pk)
+        # The entry of the second toggle is evicted.
+        caches[likes.LIKE_CACHE].delete(likes._entry_key(2))
+
+        # The missing entry is waited for by the first flush.
+        self.assertEqual(likes.flush_pending_likes(), 1)
+        self.assertEqual(list(Like.objects.values_list('post', flat=True)), [self.post.pk])
+        # It is given up on by the next one.
+        self.assertEqual(likes.flush_pending_likes(), 2)
+        self.assertEqual(set(Like.objects.values_list('post', flat=True)), {self.post.pk, self.posts[2].pk})
+        self.assertEqual(likes.flush_pending_likes(), 0)
+
+    def test_flush_lock(self):
+        caches[likes.LIKE_CACHE].add(likes.LOCK_KEY, True)
+        likes.toggle_like(self.user(self.reader), self.post.pk)
+        self.assertIsNone(likes.flush_pending_likes())
+        self.assertFalse(Like.objects.exists())
+
+    def test_process_cache(self):
+        for backend in ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache'):
+            with self.subTest(backend=backend), override_settings(CACHES={'default': {'BACKEND': backend}}):
+                with self.assertRaises(ImproperlyConfigured):
+                    likes.check_write_behind_cache('default')
+
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            likes.check_write_behind_cache('default')
+
+
+class ModerationTests(TestCase):
+    """Bulk moderation of the posts and comments, by chunks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        UserModel = get_user_model()
+        cls.author = UserModel.objects.create_user('author@example.com', 'password', first_name='A', last_name='A')
+        cls.reader = UserModel.objects.create_user('reader@example.com', 'password', first_name='R', last_name='R')
+        cls.posts = [
+            Post.objects.create(title='Apple {}'.format(i), author=cls.author, content='Fruit', status=1)
+            for i in range(5)
+        ]
+        cls.other = Post.objects.create(title='Banana', author=cls.author, content='Fruit', status=1)
+        cls.post = cls.posts[0]
+        for i in range(4):
+            Comment.objects.create(post=cls.post, author=cls.reader, content='Crunchy {}'.format(i), status=i != 0)
+        Like.objects.toggle(cls.reader, cls.post.pk)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def assertCounters(self, post, like_count, comment_count):
+        post = Post.objects.with_actual_counts().get(pk=post.pk)
+        self.assertEqual((post.like_count, post.comment_count), (like_count, comment_count))
+        self.assertEqual((post.actual_like_count, post.actual_comment_count), (like_count, comment_count))
+
+    def test_chunks(self):
+        posts = Post.objects.filter(title__startswith='Apple')
+        self.assertEqual(list(moderate_posts(posts, 'draft', 2)), [2, 4, 5])
+        self.assertEqual(list(Post.objects.filter(status=0)), list(posts))
+        self.assertEqual(Post.objects.get(pk=self.other.pk).status, 1)
+
+    def test_comment_counters(self):
+        comments = Comment.objects.filter(post=self.post)
+        self.assertCounters(self.post, 1, 3)
+        self.assertEqual(list(moderate_comments(comments, 'publish', 3)), [3, 4])
+        self.assertCounters(self.post, 1, 4)
+        self.assertEqual(list(moderate_comments(comments.filter(content__endswith='1'), 'draft')), [1])
+        self.assertCounters(self.post, 1, 3)
+        self.assertEqual(list(moderate_comments(comments.filter(status=1), 'delete', 2)), [2, 3])
+        self.assertCounters(self.post, 1, 0)
+        self.assertEqual(comments.count(), 1)
+        # The deleted comments are dropped from the index, the others kept.
+        self.assertEqual(search_comment_ids('Crunchy'), list(comments.values_list('pk', flat=True)))
+
+    def test_delete_posts(self):
+        self.assertIn(self.post.pk, likes.liked_posts(get_user_model().objects.get(pk=self.reader.pk)))
+        comment_ids = list(Comment.objects.values_list('pk', flat=True))
+        self.assertEqual(sorted(search_comment_ids('Crunchy')), sorted(comment_ids))
+
+        self.assertEqual(list(moderate_posts(Post.objects.filter(pk__in=[self.post.pk, self.posts[1].pk]),
+                                             'delete', 1)), [1, 2])
+        self.assertFalse(Post.objects.filter(pk__in=[self.post.pk, self.posts[1].pk]).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(sorted(search_post_ids('Apple')), sorted(post.pk for post in self.posts[2:]))
+        self.assertEqual(search_comment_ids('Crunchy'), [])
+        self.assertEqual(list(likes.liked_posts(get_user_model().objects.get(pk=self.reader.pk))), [])
+
+    def test_command_search(self):
+        self.assertEqual(len(search_post_ids('Apple', limit=2)), 2)
+        self.assertEqual(len(search_post_ids('Apple', limit=None)), 5)
+
+        stdout = StringIO()
+        call_command('moderate', 'posts', 'hide', search='Apple', chunk_size=2, stdout=stdout)
+        self.assertIn('5 posts match the search.', stdout.getvalue())
+        self.assertIn('Moderated 5 posts (hide).', stdout.getvalue())
+        self.assertEqual(set(Post.objects.filter(visibility=1)), set(self.posts))
+
+        stdout = StringIO()
+        call_command('moderate', 'comments', 'delete', search='Apple', status=1, stdout=stdout)
+        self.assertIn('Moderated 3 comments (delete).', stdout.getvalue())
+        self.assertCounters(self.post, 1, 0)
+
+
+class AdminTests(TestCase):
+    """Changelists and forms of the administration of the blog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        UserModel = get_user_model()
+        cls.admin = UserModel.objects.create_superuser('admin@example.com', 'password', first_name='A', last_name='A')
+        cls.add_posts(3)
+
+    @classmethod
+    def add_posts(cls, count):
+        for i in range(count):
+            post = Post.objects.create(title='Post {}'.format(i), author=cls.admin, content='Content', status=1)
+            Comment.objects.create(post=post, author=cls.admin, content='Comment', status=1)
+            Like.objects.toggle(cls.admin, post.pk)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_changelist_queries(self):
+        for model in ('post', 'comment', 'like'):
+            url = reverse('admin:blog_{}_changelist'.format(model))
+            self.get(url)
+            with self.subTest(model=model):
+                _, queries = self.get(url)
+                self.add_posts(5)
+                # The number of queries does not grow with the rows listed.
+                _, more_queries = self.get(url)
+                self.assertEqual(len(more_queries), len(queries))
+                if model != 'post':
+                    # The posts are joined to be named, without their bodies.
+                    self.assertTrue([sql for sql in queries if '"blog_post"."title"' in sql])
+                    self.assertFalse([sql for sql in queries if '"blog_post"."content' in sql])
+
+    def test_estimated_count(self):
+        url = reverse('admin:blog_post_changelist')
+        with mock.patch.object(pagination, 'ESTIMATED_COUNT_THRESHOLD', 1):
+            response, queries = self.get(url)
+            # The unfiltered table is estimated from its highest identifier.
+            self.assertEqual(response.context['cl'].result_count, Post.objects.order_by('-pk')[0].pk)
+            self.assertFalse([sql for sql in queries if sql.startswith('SELECT COUNT(') and 'blog_post' in sql])
+
+            response, queries = self.get('{}?status__exact=1'.format(url))
+            self.assertEqual(response.context['cl'].result_count, 3)
+            self.assertTrue([sql for sql in queries if sql.startswith('SELECT COUNT(') and 'blog_post' in sql])
+
+        # The small tables are counted.
+        response, _ = self.get(url)
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_like_raw_id_widgets(self):
+        like = Like.objects.order_by('pk')[0]
+        for url in (reverse('admin:blog_like_add'), reverse('admin:blog_like_change', args=[like.pk])):
+            with self.subTest(url=url):
+                self.get(url)
+                response, queries = self.get(url)
+                self.assertContains(response, 'vForeignKeyRawIdAdminField', count=2)
+                self.add_posts(5)
+                # Neither the posts nor the users are listed in select boxes.
+                _, more_queries = self.get(url)
+                self.assertEqual(len(more_queries), len(queries))
+
+    def test_search(self):
+        post = Post.objects.order_by('pk')[0]
+        post.title = 'Unique words'
+        post.save()
+        # The comments are searched by their own words, drafts included.
+        comment = Comment.objects.create(post=post, author=self.admin, content='Unique remark', status=0)
+        for model, expected, by_slug in (
+            ('post', {post}, {post}),
+            ('comment', {comment}, set(post.comments.all())),
+            ('like', set(post.likes.all()), set(post.likes.all())),
+        ):
+            with self.subTest(model=model):
+                url = reverse('admin:blog_{}_changelist'.format(model))
+                response, _ = self.get('{}?q=Unique'.format(url))
+                self.assertEqual(set(response.context['cl'].result_list), expected)
+                response, _ = self.get('{}?q={}'.format(url, post.slug))
+                self.assertEqual(set(response.context['cl'].result_list), by_slug)
+
+
+@mock.patch.object(page_cache, 'PAGE_CACHE', True)
+class PageCacheTests(TestCase):
+    """Page cache of the anonymous readers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(
+            'author@example.com', 'password', first_name='A', last_name='A')
+        cls.post = Post.objects.create(title='Post', author=cls.author, content='Content', status=1)
+
+    def setUp(self):
+        self.cache = caches[page_cache.PAGE_CACHE_ALIAS]
+        self.cache.clear()
+        self.url = reverse('blog:home')
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def page_key(self, response):
+        return page_cache.page_cache_key(response['ETag'].strip('"'), self.url)
+
+    def test_hit(self):
+        response, queries = self.get()
+        self.assertIsNotNone(self.cache.get(self.page_key(response)))
+        cached, cached_queries = self.get()
+        # Only the validators are queried.
+        self.assertEqual(cached_queries, 1)
+        self.assertLess(cached_queries, queries)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_write(self):
+        response, _ = self.get()
+        Post.objects.create(title='Newer post', author=self.author, content='Content', status=1)
+        # The page is rendered again under a new fingerprint.
+        fresh, queries = self.get()
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
+        self.assertGreater(queries, 1)
+        self.assertContains(fresh, 'Newer post')
+        self.assertIsNotNone(self.cache.get(self.page_key(fresh)))
+
+    def test_authenticated(self):
+        self.client.force_login(self.author)
+        self.get()
+        _, queries = self.get()
+        self.assertGreater(queries, 1)
+
+    def test_lock_wait(self):
+        response, _ = self.get()
+        key = self.page_key(response)
+        page = self.cache.get(key)
+        self.cache.clear()
+        self.cache.add('{}:lock'.format(key), True)
+
+        # The page stored by the holder of the lock meanwhile is served.
+        with mock.patch.object(page_cache.time, 'sleep', side_effect=lambda _: self.cache.set(key, page)):
+            cached, queries = self.get()
+        self.assertEqual(queries, 1)
+        self.assertEqual(cached.content, response.content)
+
+    def test_lock_timeout(self):
+        response, _ = self.get()
+        key = self.page_key(response)
+        self.cache.clear()
+        self.cache.add('{}:lock'.format(key), True)
+
+        # The page is rendered without being stored, once the holder of the
+        # lock is given up on.
+        with mock.patch.object(page_cache, 'PAGE_CACHE_WAIT_TIMEOUT', 0.05):
+            rendered, queries = self.get()
+        self.assertGreater(queries, 1)
+        self.assertEqual(rendered.content, response.content)
+        self.assertIsNone(self.cache.get(key))
+        self.assertTrue(self.cache.get('{}:lock'.format(key)))
+
+
+class LikedPostsTests(TestCase):
+    """Liked posts of the users, cached as sorted arrays."""
+
+    @classmethod
+    def setUpTestData(cls):
+        UserModel = get_user_model()
+        cls.author = UserModel.objects.create_user('author@example.com', 'password', first_name='A', last_name='A')
+        cls.reader = UserModel.objects.create_user('reader@example.com', 'password', first_name='R', last_name='R')
+        cls.posts = [
+            Post.objects.create(title='Post {}'.format(i), author=cls.author, content='Content', status=1)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        caches[likes.LIKE_CACHE].clear()
+
+    def liked_posts(self):
+        return list(likes.liked_posts(get_user_model().objects.get(pk=self.reader.pk)))
+
+    def test_sorted_array(self):
+        liked_posts = likes.LikedPosts([5, 1, 3])
+        liked_posts.add(2)
+        liked_posts.add(3)
+        liked_posts.discard(5)
+        liked_posts.discard(4)
+        self.assertEqual(list(liked_posts), [1, 2, 3])
+        self.assertEqual(list(likes.LikedPosts.frombytes(liked_posts.tobytes())), [1, 2, 3])
+        self.assertNotIn(4, liked_posts)
+
+    def test_toggle(self):
+        self.assertEqual(self.liked_posts(), [])
+        likes.toggle_like(self.reader, self.posts[2].pk)
+        likes.toggle_like(self.reader, self.posts[0].pk)
+        self.assertEqual(self.liked_posts(), [self.posts[0].pk, self.posts[2].pk])
+        likes.toggle_like(self.reader, self.posts[2].pk)
+        self.assertEqual(self.liked_posts(), [self.posts[0].pk])
+
+    def test_view(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse('blog:home'))
+        for liked in (True, False):
+            response = self.client.post(reverse('blog:like', kwargs={'post_id': self.posts[1].pk}),
+                                        HTTP_ACCEPT='application/json')
+            self.assertEqual(response.json()['liked'], liked)
+            self.assertEqual(self.liked_posts(), [self.posts[1].pk] if liked else [])
+
+    def test_view_redirect(self):
+        # The forms posted without JavaScript go back to the page they were on,
+        # or to the post list.
+        self.client.force_login(self.reader)
+        url = reverse('blog:like', kwargs={'post_id': self.posts[1].pk})
+        referer = reverse('blog:details', args=[self.posts[1].slug])
+        response = self.client.post(url, HTTP_REFERER=referer)
+        self.assertRedirects(response, referer)
+        self.assertEqual(self.liked_posts(), [self.posts[1].pk])
+        response = self.client.post(url)
+        self.assertRedirects(response, reverse('blog:home'))
+        self.assertEqual(self.liked_posts(), [])
+
+    def test_moderation(self):
+        likes.toggle_like(self.reader, self.posts[1].pk)
+        self.assertEqual(self.liked_posts(), [self.posts[1].pk])
+        list(moderate_posts(Post.objects.filter(pk=self.posts[1].pk), 'delete'))
+        self.assertEqual(self.liked_posts(), [])
+
+    def test_post_list(self):
+        likes.toggle_like(self.reader, self.posts[1].pk)
+        self.client.force_login(self.reader)
+        self.client.get(reverse('blog:home'))
+
+        cache = caches[likes.LIKE_CACHE]
+        with mock.patch.object(cache, 'get', wraps=cache.get) as get, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog:home'))
+        # The liked posts are read once from the cache, and never queried.
+        reads = [call for call in get.call_args_list if call[0][0] == likes._liked_posts_key(self.reader.pk)]
+        self.assertEqual(len(reads), 1)
+        self.assertFalse([query for query in queries if 'blog_like' in query['sql']])
+        self.assertContains(response, '>Unlike<', count=1)
+
+
+class CounterTests(TestCase):
+    """Like and comment counters stored on the posts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        UserModel = get_user_model()
+        cls.author = UserModel.objects.create_user('author@example.com', 'password', first_name='A', last_name='A')
+        cls.reader = UserModel.objects.create_user('reader@example.com', 'password', first_name='R', last_name='R')
+        cls.post, cls.other = [
+            Post.objects.create(title='Post {}'.format(i), author=cls.author, content='Content', status=1)
+            for i in range(2)
+        ]
+
+    def assertCounters(self, *expected):
+        posts = Post.objects.with_actual_counts().filter(pk__in=[self.post.pk, self.other.pk]).order_by('pk')
+        self.assertEqual([(post.like_count, post.comment_count) for post in posts], list(expected))
+        self.assertEqual([(post.actual_like_count, post.actual_comment_count) for post in posts], list(expected))
+
+    def test_likes(self):
+        self.assertTrue(Like.objects.toggle(self.reader, self.post.pk))
+        self.assertTrue(Like.objects.toggle(self.author, self.post.pk))
+        self.assertCounters((2, 0), (0, 0))
+        self.assertFalse(Like.objects.toggle(self.reader, self.post.pk))
+        self.assertCounters((1, 0), (0, 0))
+        self.assertTrue(Like.objects.toggle(self.reader, self.other.pk))
+        self.assertCounters((1, 0), (1, 0))
+
+    def test_comments(self):
+        published = Comment.objects.create(post=self.post, author=self.reader, content='Published', status=1)
+        draft = Comment.objects.create(post=self.post, author=self.reader, content='Draft', status=0)
+        self.assertCounters((0, 1), (0, 0))
+
+        draft.status = 1
+        draft.save()
+        self.assertCounters((0, 2), (0, 0))
+        # The comments loaded from the database are compared with their stored
+        # state.
+        draft = Comment.objects.get(pk=draft.pk)
+        draft.status = 0
+        draft.save()
+        self.assertCounters((0, 1), (0, 0))
+
+        published = Comment.objects.get(pk=published.pk)
+        published.post = self.other
+        published.save()
+        draft.post = self.other
+        draft.save()
+        self.assertCounters((0, 0), (0, 1))
+
+        published.delete()
+        draft.delete()
+        self.assertCounters((0, 0), (0, 0))
+
+    def test_comment_without_state(self):
+        comment = Comment.objects.create(post=self.post, author=self.reader, content='Published', status=1)
+        # A comment built rather than loaded has its post recounted.
+        Comment(pk=comment.pk, post=self.post, author=self.reader, content='Drafted', status=0,
+                created_on=comment.created_on).save()
+        self.assertCounters((0, 0), (0, 0))
+
+    def test_floor(self):
+        Post.objects.filter(pk=self.post.pk).shift_counter('like_count', -1)
+        self.assertCounters((0, 0), (0, 0))
+
+    def test_reconcile(self):
+        Like.objects.toggle(self.reader, self.post.pk)
+        Comment.objects.create(post=self.post, author=self.reader, content='Published', status=1)
+        Post.objects.filter(pk=self.post.pk).update(like_count=5, comment_count=0)
+        Post.objects.filter(pk=self.other.pk).update(comment_count=3)
+
+        self.assertEqual(Post.objects.reconcile_counters(), 2)
+        self.assertCounters((1, 1), (0, 0))
+        self.assertEqual(Post.objects.reconcile_counters(), 0)
+
+    def test_reconcile_command(self):
+        Post.objects.filter(pk=self.other.pk).update(like_count=2)
+        stdout = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=stdout)
+        self.assertIn('Checked 2 posts, fixed 1.', stdout.getvalue())
+        self.assertCounters((0, 0), (0, 0))
+
+
+class RandomSlugTests(TestCase):
+    """Random slugs of the posts, drawn again on collisions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(
+            'author@example.com', 'password', first_name='A', last_name='A')
+        cls.taken = Post.objects.create(slug='taken', title='Taken', author=cls.author, content='Content')
+
+    def post(self, **kwargs):
+        return Post(title='Post', author=self.author, content='<p>Content</p>', **kwargs)
+
+    def test_random(self):
+        post = self.post()
+        post.save()
+        self.assertRegex(post.slug, r'^[a-z0-9]{15}$')
+        # The slug is kept when the post is saved again.
+        slug = post.slug
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).slug, slug)
+
+    def test_collision(self):
+        with mock.patch.object(RandomSlugField, 'generate_slug', side_effect=['taken', 'taken', 'fresh']) as generate:
+            post = self.post()
+            post.save()
+        self.assertEqual(generate.call_count, 3)
+        self.assertEqual(Post.objects.get(pk=post.pk).slug, 'fresh')
+
+    def test_exhausted(self):
+        with mock.patch.object(RandomSlugField, 'generate_slug', return_value='taken'):
+            with self.assertRaises(FieldError):
+                self.post().save()
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_bulk_create(self):
+        posts = Post.objects.bulk_create([self.post(), self.post(), self.post(slug='given')])
+        slugs = [post.slug for post in posts]
+        self.assertEqual(slugs[2], 'given')
+        self.assertEqual(len(set(slugs)), 3)
+        self.assertEqual(set(Post.objects.values_list('slug', flat=True)), set(slugs) | {'taken'})
+        # The content is rendered as save() would.
+        self.assertEqual(set(Post.objects.filter(slug__in=slugs).values_list('excerpt', 'content_html')),
+                         {('Content', '<p>Content</p>')})
+
+    def test_bulk_create_collision(self):
+        # The first candidate of the first post is taken, and its second one
+        # is the candidate assigned to the other post.
+        with mock.patch.object(RandomSlugField, 'generate_slug', side_effect=['taken', 'a', 'a', 'b']):
+            posts = Post.objects.bulk_create([self.post(), self.post()])
+        self.assertEqual([post.slug for post in posts], ['b', 'a'])
+
+    def test_bulk_create_exhausted(self):
+        with mock.patch.object(RandomSlugField, 'generate_slug', return_value='taken'):
+            with self.assertRaises(FieldError):
+                Post.objects.bulk_create([self.post()])
+
+
+@mock.patch.object(views, 'COMMENTS_PER_PAGE', 2)
+class CommentListTests(TestCase):
+    """Pages of comments of the posts, and the drafts each reader sees."""
+
+    @classmethod
+    def setUpTestData(cls):
+        UserModel = get_user_model()
+        cls.author = UserModel.objects.create_user('author@example.com', 'password', first_name='A', last_name='A')
+        cls.reader = UserModel.objects.create_user('reader@example.com', 'password', first_name='R', last_name='R')
+        cls.staff = UserModel.objects.create_user('staff@example.com', 'password', first_name='S', last_name='S',
+                                                  is_staff=True)
+        cls.post = Post.objects.create(title='Post', author=cls.author, content='Content', status=1)
+        # Published comments, and drafts of the author and of the reader, the
+        # oldest first.
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=author, content='Comment {}'.format(i), status=status)
+            for i, (author, status) in enumerate([
+                (cls.reader, 1), (cls.author, 0), (cls.reader, 1), (cls.reader, 0), (cls.author, 1),
+            ])
+        ]
+        Comment.objects.create(post=Post.objects.create(title='Other', author=cls.author, content='Content'),
+                               author=cls.author, content='Other', status=1)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def pages(self):
+        """Return the identifiers of the comments of each page, the first one
+        being rendered with the post."""
+        response = self.client.get(reverse('blog:details', args=[self.post.slug]))
+        pages = [[comment.pk for comment in response.context['comments']]]
+        url = response.context['comments_next_url']
+        while url is not None:
+            data = self.client.get(url).json()
+            pages.append([comment['id'] for comment in data['comments']])
+            url = data['next']
+        return pages
+
+    def comment_ids(self, *indexes):
+        return [self.comments[index].pk for index in indexes]
+
+    def test_anonymous(self):
+        self.assertEqual(self.pages(), [self.comment_ids(0, 2), self.comment_ids(4)])
+
+    def test_reader(self):
+        self.client.force_login(self.reader)
+        self.assertEqual(self.pages(), [self.comment_ids(0, 2), self.comment_ids(3, 4)])
+
+    def test_author(self):
+        # The author of the post sees their own drafts only.
+        self.client.force_login(self.author)
+        self.assertEqual(self.pages(), [self.comment_ids(0, 1), self.comment_ids(2, 4)])
+
+    def test_staff(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.pages(), [self.comment_ids(0, 1), self.comment_ids(2, 3), self.comment_ids(4)])
+
+    def test_page_boundary(self):
+        # A page ending on the last comment has no next page.
+        Comment.objects.filter(pk=self.comments[4].pk).delete()
+        self.assertEqual(self.pages(), [self.comment_ids(0, 2)])
+
+    def test_json(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('blog:details', args=[self.post.slug]))
+        data = self.client.get(response.context['comments_next_url']).json()
+        self.assertEqual(data['next'], None)
+        self.assertEqual([(comment['author'], comment['content_html'], comment['status'])
+                          for comment in data['comments']],
+                         [(str(self.reader), 'Comment 3', 0), (str(self.author), 'Comment 4', 1)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('blog:comments', args=[self.post.slug]), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('blog:comments', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+
+class ExportTests(TestCase):
+    """Incremental static export of the public blog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(
+            'author@example.com', 'password', first_name='A', last_name='A')
+        for i in range(5):
+            Post.objects.create(title='Post {}'.format(i), author=cls.author, content='Content', status=1)
+        Post.objects.create(title='Draft', author=cls.author, content='Content', status=0)
+        Post.objects.create(title='Hidden', author=cls.author, content='Content', status=1, visibility=1)
+        # The posts in the order of the post list, three pages of two posts.
+        cls.posts = list(Post.objects.filter(status=1, visibility=0).order_by('-created_on', '-id'))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = directory.name
+
+    def export(self):
+        stdout = StringIO()
+        with mock.patch('blog.management.commands.export_static.POSTS_PER_PAGE', 2):
+            call_command('export_static', output=self.output, jobs=1, stdout=stdout)
+        return stdout.getvalue().strip()
+
+    def read(self, url):
+        with open(export.url_path(self.output, url), encoding='utf-8') as file:
+            return file.read()
+
+    def test_incremental(self):
+        self.assertEqual(self.export(), 'Rendered 5 posts and 3 list pages, removed 0 posts.')
+        self.assertIn('Post 0', self.read(export.list_page_url(3)))
+        self.assertEqual(self.export(), 'Rendered 0 posts and 0 list pages, removed 0 posts.')
+
+        # Only the edited post and the list page holding it are rendered again.
+        post = self.posts[2]
+        post.title = 'Edited'
+        post.save()
+        self.assertEqual(self.export(), 'Rendered 1 posts and 1 list pages, removed 0 posts.')
+        self.assertIn('Edited', self.read(reverse('blog:details', args=[post.slug])))
+        self.assertIn('Edited', self.read(export.list_page_url(2)))
+
+        # So are the posts newly commented or liked.
+        Comment.objects.create(post=self.posts[0], author=self.author, content='Comment', status=1)
+        Like.objects.toggle(self.author, self.posts[4].pk)
+        self.assertEqual(self.export(), 'Rendered 2 posts and 2 list pages, removed 0 posts.')
+        self.assertEqual(self.export(), 'Rendered 0 posts and 0 list pages, removed 0 posts.')
+
+    def test_removed(self):
+        self.export()
+        path = export.url_path(self.output, reverse('blog:details', args=[self.posts[1].slug]))
+        self.assertTrue(path.exists())
+        Post.objects.filter(pk=self.posts[1].pk).update(status=0)
+        # The next posts move up the pages, the last one of which is removed.
+        self.assertEqual(self.export(), 'Rendered 0 posts and 2 list pages, removed 1 posts.')
+        self.assertFalse(path.exists())
+        self.assertFalse(export.url_path(self.output, export.list_page_url(3)).exists())
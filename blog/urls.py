@@ -22,6 +22,8 @@ app_name = BlogConfig.name
 urlpatterns = [
     path('', views.PostListView.as_view(), name='home'),
     path('create/', views.CreatePostView.as_view(), name='create'),
+    path('search/', views.SearchPostView.as_view(), name='search'),
     path('like/<int:post_id>', views.UpdatePostLike.as_view(), name='like'),
     path('<slug:slug>/', views.PostDetailView.as_view(), name='details'),
+    path('<slug:slug>/comments/', views.CommentListView.as_view(), name='comments'),
 ]
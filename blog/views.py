@@ -1,55 +1,118 @@
 from pathlib import Path
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, Http404, JsonResponse
 from django.shortcuts import get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
+from django.utils.formats import date_format
+from django.utils.http import urlencode
+from django.utils.timezone import localtime
 from django.views import generic, View
 from django.views.generic.edit import FormMixin
 
+from .cache import PostDetailCacheMixin, PostListCacheMixin
 from .forms import BlogCreationForm, CommentCreationForm
-from .models import Post, Comment, Like
+from .likes import liked_posts, merge_pending_likes, toggle_like
+from .models import Post, Comment
+from .pagination import CursorPaginator, InvalidCursor
 
 BLOG_DIR = Path(__package__)
+POSTS_PER_PAGE = getattr(settings, 'POSTS_PER_PAGE', 10)
+COMMENTS_PER_PAGE = getattr(settings, 'COMMENTS_PER_PAGE', 50)
 
 
-class PostListView(generic.ListView):
+def get_comments_page(post, user, cursor=None):
+    """Return the page of the comments of ``post`` located by ``cursor``,
+    among the ones ``user`` has access to, the oldest first."""
+    comments = Comment.objects.filter(post=post).select_related('author').defer('content').visible_parts(user)
+    return CursorPaginator(comments, COMMENTS_PER_PAGE, ordering=('created_on', 'id')).get_page(cursor)
+
+
+def get_comments_url(post, cursor):
+    """Return the URL of the JSON page of comments located by ``cursor``."""
+    if cursor is None:
+        return None
+    return '{}?{}'.format(reverse('blog:comments', args=[post.slug]), urlencode({'cursor': cursor}))
+
+
+class PostListView(PostListCacheMixin, generic.ListView):
     """Post list view."""
 
     template_name = BLOG_DIR / 'home.html'
-    queryset = Post.objects.filter(status=1).order_by('-created_on')
+    queryset = Post.objects.filter(status=1).order_by('-created_on', '-id')
     context_object_name = 'posts'
+    paginate_by = POSTS_PER_PAGE
+    paginator_class = CursorPaginator
+    cursor_kwarg = 'cursor'
 
     def get_queryset(self):
-        queryset = super(PostListView, self).get_queryset()
+        # The list only displays the excerpts of the posts.
+        queryset = super(PostListView, self).get_queryset().with_stats().defer('content', 'content_html')
         if not self.request.user.is_authenticated:
             queryset = queryset.filter(visibility=0)
 
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        # The posts are paginated on the (created_on, id) key rather than on
+        # page numbers, so that deep pages cost as much as the first one.
+        paginator = self.get_paginator(queryset, page_size)
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        try:
+            page = paginator.get_page(cursor)
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+
+        merge_pending_likes(self.request.user, page.object_list)
+
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return self.paginator_class(queryset, per_page, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super(PostListView, self).get_context_data(**kwargs)
+        page = context['page_obj']
+        context.update({
+            'liked_posts': liked_posts(self.request.user),
+            'previous_page_url': self.get_page_url(page.previous_cursor),
+            'next_page_url': self.get_page_url(page.next_cursor),
+        })
+
+        return context
+
+    def get_page_url(self, cursor):
+        if cursor is None:
+            return None
+        return '?{}'.format(urlencode({self.cursor_kwarg: cursor}))
 
-class PostDetailView(FormMixin, generic.DetailView):
+
+class PostDetailView(PostDetailCacheMixin, FormMixin, generic.DetailView):
     """Post details view."""
 
     template_name = BLOG_DIR / 'details.html'
     model = Post
     form_class = CommentCreationForm
 
+    def get_queryset(self):
+        return super(PostDetailView, self).get_queryset().with_stats().defer('content')
+
+    def get_object(self, queryset=None):
+        post = super(PostDetailView, self).get_object(queryset)
+        merge_pending_likes(self.request.user, [post])
+        return post
+
     def get_context_data(self, **kwargs):
         context = super(PostDetailView, self).get_context_data(**kwargs)
-        if self.request.user.is_staff:
-            # A staff user has access to all the published and drafted comments.
-            comment_query = Q()
-        else:
-            comment_query = Q(status=1)
-            if self.request.user.is_authenticated:
-                comment_query.add(Q(author=self.request.user), Q.OR)
-        comment_query.add(Q(post_id=self.object), Q.AND)
-
+        # Only the first page of comments is rendered, the next ones being
+        # loaded from the comment list view.
+        comments = get_comments_page(self.object, self.request.user)
         context.update({
-            'comments': Comment.objects.filter(comment_query).order_by('created_on'),
+            'comments': comments.object_list,
+            'comments_next_url': get_comments_url(self.object, comments.next_cursor),
+            'liked_posts': liked_posts(self.request.user),
         })
         if self.request.user.is_authenticated:
             context.update({'form': self.form_class()})
@@ -76,6 +139,62 @@ class PostDetailView(FormMixin, generic.DetailView):
         return self.render_to_response(self.get_context_data(form=form))
 
 
+class CommentListView(View):
+    """Comment list view, returning the pages of comments of a post as JSON."""
+
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        post = get_object_or_404(Post.objects.only('pk', 'slug'), slug=self.kwargs.get('slug'))
+        try:
+            page = get_comments_page(post, request.user, request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': str(comment.author),
+                    'content_html': comment.content_html,
+                    'created_on': date_format(localtime(comment.created_on), 'DATETIME_FORMAT'),
+                    'status': comment.status,
+                }
+                for comment in page.object_list
+            ],
+            'next': get_comments_url(post, page.next_cursor),
+        })
+
+
+class SearchPostView(generic.ListView):
+    """Post search view."""
+
+    template_name = BLOG_DIR / 'search.html'
+    queryset = Post.objects.all()
+    context_object_name = 'posts'
+    paginate_by = POSTS_PER_PAGE
+    search_kwarg = 'q'
+
+    def get_queryset(self):
+        # The posts are ranked and filtered by the full-text index, only the
+        # matching ones being loaded.
+        self.query = self.request.GET.get(self.search_kwarg, '').strip()
+        filters = {'status': 1}
+        if not self.request.user.is_authenticated:
+            filters['visibility'] = 0
+
+        return (
+            super(SearchPostView, self).get_queryset().search(self.query, **filters)
+            .with_stats().defer('content', 'content_html')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchPostView, self).get_context_data(**kwargs)
+        context.update({'query': self.query})
+
+        return context
+
+
 @method_decorator(login_required, name='dispatch')
 class CreatePostView(generic.CreateView):
     """Post creation view."""
@@ -94,24 +213,24 @@ class CreatePostView(generic.CreateView):
 class UpdatePostLike(View):
     """Update post like database."""
 
+    http_method_names = ['post']
     redirect_to = reverse_lazy('blog:home')
 
-    def get(self, request, *args, **kwargs):
+    def post(self, request, *args, **kwargs):
         post_id = self.kwargs.get('post_id', None)
-        post = get_object_or_404(Post, id=post_id)
-        referer = request.META.get('HTTP_REFERER', self.redirect_to)
-
-        # Create the Like model relating to the post.
-        try:
-            post.likes
-        except Like.DoesNotExist:
-            Like.objects.create(post=post)
+        post = get_object_or_404(Post.objects.only('pk', 'like_count'), id=post_id)
+        merge_pending_likes(request.user, [post])
 
         # Dump/delete the like request into the database.
-        if request.user in post.likes.users.all():
-            post.likes.users.remove(request.user)
-        else:
-            post.likes.users.add(request.user)
-
-        return HttpResponseRedirect(referer)
-
+        liked = toggle_like(request.user, post.pk)
+
+        if 'application/json' in request.META.get('HTTP_ACCEPT', ''):
+            # The count is deduced from the one read before the toggle, which
+            # flipped the state of the like.
+            return JsonResponse({
+                'post': post.pk,
+                'liked': liked,
+                'like_count': max(post.like_count + (1 if liked else -1), 0),
+            })
+
+        return HttpResponseRedirect(request.META.get('HTTP_REFERER', self.redirect_to))
@@ -0,0 +1,119 @@
+"""
+Django customized middleware for modersonal project.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/topics/http/middleware/
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .minify import minify_html, minify_html_sequence
+
+HTML_MINIFY = getattr(settings, 'HTML_MINIFY', True)
+STATIC_IMMUTABLE_MAX_AGE = getattr(settings, 'STATICFILES_IMMUTABLE_MAX_AGE', 365 * 24 * 60 * 60)
+STATIC_MAX_AGE = getattr(settings, 'STATICFILES_MAX_AGE', 60)
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class StaticFilesMiddleware:
+    """Serve the collected static files, for the deployments without a web
+    server in front of Django.
+
+    The gzipped copies written by collectstatic are served to the clients
+    accepting them. The files named after their content hash are cached for a
+    year as immutable, and the others for STATICFILES_MAX_AGE seconds. The
+    requests of the files missing from STATIC_ROOT are passed on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.STATIC_ROOT or not settings.STATIC_URL.startswith('/'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.root = str(settings.STATIC_ROOT)
+        self.prefix = settings.STATIC_URL
+        # The hashed names of the manifest, read once, collectstatic being
+        # followed by a restart of the processes.
+        self.hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+            stats = os.stat(path)
+        except (SuspiciousFileOperation, OSError, ValueError):
+            return None
+        if not stat.S_ISREG(stats.st_mode):
+            return None
+
+        if name in self.hashed_names:
+            cache_control = 'public, max-age={}, immutable'.format(STATIC_IMMUTABLE_MAX_AGE)
+        else:
+            cache_control = 'public, max-age={}'.format(STATIC_MAX_AGE)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stats.st_mtime, stats.st_size):
+            response = HttpResponseNotModified()
+            response['Cache-Control'] = cache_control
+            return response
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        served_path, encoding = path, None
+        compressed_path = '{}.gz'.format(path)
+        has_compressed = os.path.isfile(compressed_path)
+        if has_compressed and ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            served_path, encoding = compressed_path, 'gzip'
+
+        response = FileResponse(open(served_path, 'rb'), content_type=content_type, filename=os.path.basename(path))
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        if has_compressed:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        response['Last-Modified'] = http_date(stats.st_mtime)
+        response['Cache-Control'] = cache_control
+        return response
+
+
+class HTMLMinifyMiddleware:
+    """Minify the whitespace of the HTML pages, see modersonal/minify.py.
+
+    It is meant to follow the GZipMiddleware, so that the pages are minified
+    before being compressed. The rendered pages are minified whole, and the
+    streamed ones chunk by chunk, as they are compressed.
+    """
+
+    def __init__(self, get_response):
+        if not HTML_MINIFY:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (not response.get('Content-Type', '').startswith('text/html')
+                or response.has_header('Content-Encoding')):
+            return response
+
+        if response.streaming:
+            response.streaming_content = minify_html_sequence(response.streaming_content, response.charset)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        elif response.content:
+            response.content = minify_html(response.content, response.charset)
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = str(len(response.content))
+        return response
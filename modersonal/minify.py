@@ -0,0 +1,98 @@
+"""
+Whitespace minification of the HTML pages of modersonal project.
+
+The indentation and the blank lines left by the templates are removed, each
+run of blanks spanning several lines being replaced by a single line break,
+which the browsers render the same way. The content of the pre, textarea,
+script and style elements is left untouched.
+
+The minifier is incremental, so that the streamed pages are minified chunk by
+chunk.
+"""
+import codecs
+import re
+
+PRESERVED_START = re.compile(r'<(pre|textarea|script|style)[\s/>]', re.IGNORECASE)
+PRESERVED_END = {
+    tag: re.compile(r'</{}\s*>'.format(tag), re.IGNORECASE) for tag in ('pre', 'textarea', 'script', 'style')
+}
+# The longest prefix of the start tag of a preserved element, '<textarea '.
+PRESERVED_START_LENGTH = 10
+BLANK_LINES = re.compile(r'\s*\n\s*')
+
+
+def minify_whitespace(text):
+    return BLANK_LINES.sub('\n', text)
+
+
+class HTMLMinifier:
+    """Incremental minifier, fed with the successive pieces of a page."""
+
+    def __init__(self):
+        self.buffer = ''
+        self.preserved = None
+
+    def feed(self, text):
+        """Return the minified text which can be output so far."""
+        self.buffer += text
+        return ''.join(self.process(final=False))
+
+    def close(self):
+        """Return the rest of the minified text."""
+        return ''.join(self.process(final=True))
+
+    def process(self, final):
+        buffer = self.buffer
+        while buffer:
+            if self.preserved is not None:
+                end = PRESERVED_END[self.preserved].search(buffer)
+                if end is None:
+                    # The preserved element is output once complete.
+                    if final:
+                        yield buffer
+                        buffer = ''
+                    break
+                yield buffer[:end.end()]
+                buffer = buffer[end.end():]
+                self.preserved = None
+                continue
+
+            start = PRESERVED_START.search(buffer)
+            if start is not None:
+                yield minify_whitespace(buffer[:start.start()])
+                buffer = buffer[start.start():]
+                self.preserved = start.group(1).lower()
+            elif final:
+                yield minify_whitespace(buffer)
+                buffer = ''
+            else:
+                # The trailing blanks may go on in the next piece, and so may
+                # the start tag of a preserved element, hence they are kept.
+                cut = len(buffer.rstrip())
+                tag = buffer.rfind('<', max(cut - PRESERVED_START_LENGTH, 0), cut)
+                if tag != -1:
+                    cut = tag
+                yield minify_whitespace(buffer[:cut])
+                buffer = buffer[cut:]
+                break
+        self.buffer = buffer
+
+
+def minify_html(content, charset):
+    """Return the minified ``content`` of a page."""
+    minifier = HTMLMinifier()
+    text = minifier.feed(content.decode(charset, 'surrogateescape')) + minifier.close()
+    return text.encode(charset, 'surrogateescape')
+
+
+def minify_html_sequence(sequence, charset):
+    """Minify the pieces of a streamed page."""
+    decoder = codecs.getincrementaldecoder(charset)('surrogateescape')
+    minifier = HTMLMinifier()
+    for piece in sequence:
+        text = minifier.feed(decoder.decode(piece))
+        if text:
+            yield text.encode(charset, 'surrogateescape')
+    text = minifier.feed(decoder.decode(b'', final=True)) + minifier.close()
+    if text:
+        yield text.encode(charset, 'surrogateescape')
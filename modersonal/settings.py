@@ -42,14 +42,20 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'blog',
     'users',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'modersonal.middleware.StaticFilesMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
+    'modersonal.middleware.HTMLMinifyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'monitoring.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -95,6 +101,31 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+# The cache holds the sessions, the pages and the login attempts, hence it
+# should be shared by the processes, such as memcached, and be set in the local
+# settings. The local memory cache it falls back to is only fit for a single
+# development process.
+if 'CACHES' not in globals():
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'modersonal',
+        },
+    }
+
+
+# Sessions
+# https://docs.djangoproject.com/en/3.1/topics/http/sessions/
+
+# The sessions are read from the cache, the database only being read on a miss
+# and written to when a session changes, see the CACHES setting above.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -117,6 +148,11 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
     '/var/www/static/',
 ]
+# The collected files are named after their content and gzipped, see
+# modersonal/storage.py, and served by modersonal.middleware.StaticFilesMiddleware
+# when no web server serves them.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_STORAGE = 'modersonal.storage.CompressedManifestStaticFilesStorage'
 
 # Customizing authentication
 # https://docs.djangoproject.com/en/3.1/topics/auth/customizing/
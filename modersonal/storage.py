@@ -0,0 +1,61 @@
+"""
+Django customized static files storage for modersonal project.
+
+The collectstatic command names the files after a hash of their content,
+records the names in a manifest, and writes a gzipped copy of the compressible
+ones along with them, to be served by the StaticFilesMiddleware or the web
+server.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/ref/contrib/staticfiles/#manifeststaticfilesstorage
+"""
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+GZIP_EXTENSIONS = getattr(settings, 'STATICFILES_GZIP_EXTENSIONS', (
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico', '.eot', '.otf', '.ttf',
+))
+GZIP_MIN_SIZE = getattr(settings, 'STATICFILES_GZIP_MIN_SIZE', 200)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage writing gzipped copies of the compressible files."""
+
+    def stored_name(self, name):
+        # Until collectstatic has written the manifest, in development or in
+        # the tests, the files keep their names.
+        if not self.hashed_files:
+            return name
+        return super(CompressedManifestStaticFilesStorage, self).stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super(CompressedManifestStaticFilesStorage, self).post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        # Both the original and the hashed files are compressed, the former
+        # still being served under their names.
+        for name in set(paths).union(self.hashed_files.values()):
+            if name.endswith(GZIP_EXTENSIONS) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        compressed_path = '{}.gz'.format(path)
+        with open(path, 'rb') as file:
+            content = file.read()
+        # The modification time is left out of the archive, so that the same
+        # file is always compressed the same way.
+        compressed = gzip.compress(content, compresslevel=9, mtime=0) if len(content) >= GZIP_MIN_SIZE else content
+        if len(compressed) >= len(content):
+            # A stale copy of a previous collection is not served instead.
+            if os.path.exists(compressed_path):
+                os.remove(compressed_path)
+            return
+        temporary = '{}.tmp'.format(compressed_path)
+        with open(temporary, 'wb') as file:
+            file.write(compressed)
+        os.replace(temporary, compressed_path)
@@ -0,0 +1,129 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from .middleware import HTMLMinifyMiddleware
+from .minify import minify_html, minify_html_sequence
+
+PAGE = '''<!DOCTYPE html>
+<html>
+    <body>
+
+        <p>Some <b>bold</b> <i>italic</i> and  <a href="#">linked</a>
+            <span>words</span></p>
+        <pre>
+    indented
+        code
+
+</pre>
+        <textarea name="content">
+  first line
+
+  second line
+</textarea>
+        <script>
+            var text = "  spaced  \\n\\n  ";
+        </script>
+        <STYLE type="text/css">
+            p {  margin: 0;  }
+        </STYLE>
+    </body>
+</html>
+'''
+
+MINIFIED = '''<!DOCTYPE html>
+<html>
+<body>
+<p>Some <b>bold</b> <i>italic</i> and  <a href="#">linked</a>
+<span>words</span></p>
+<pre>
+    indented
+        code
+
+</pre>
+<textarea name="content">
+  first line
+
+  second line
+</textarea>
+<script>
+            var text = "  spaced  \\n\\n  ";
+        </script>
+<STYLE type="text/css">
+            p {  margin: 0;  }
+        </STYLE>
+</body>
+</html>
+'''
+
+
+class MinifyTests(SimpleTestCase):
+
+    def test_minify(self):
+        self.assertEqual(minify_html(PAGE.encode(), 'utf-8').decode(), MINIFIED)
+
+    def test_inline_whitespace(self):
+        # The spaces between the inline elements on a line are rendered, hence
+        # kept, and so are those of the line breaks.
+        for html in ('<b>a</b> <i>b</i>', '<b>a</b>  <i>b</i>', 'a <span>b</span>\nc', '<b>a</b>\n<i>b</i>'):
+            with self.subTest(html=html):
+                self.assertEqual(minify_html(html.encode(), 'utf-8').decode(), html)
+
+    def test_preserved_elements(self):
+        for html in (
+            '<pre>\n  a\n\n  b\n</pre>',
+            '<pre class="code">  a\n\n  b  </pre>',
+            '<textarea>\n\n  a\n</textarea>',
+            '<script>\n  if (a) {\n\n    b();\n  }\n</script>',
+            '<style>\n  a {\n\n    color: red;\n  }\n</style>',
+        ):
+            with self.subTest(html=html):
+                self.assertEqual(minify_html(html.encode(), 'utf-8').decode(), html)
+
+    def test_unclosed_preserved_element(self):
+        html = '<p>a</p>\n\n<pre>\n  a\n\n  b\n'
+        self.assertEqual(minify_html(html.encode(), 'utf-8').decode(), '<p>a</p>\n<pre>\n  a\n\n  b\n')
+
+    def test_sequence(self):
+        # The chunks split the start and end tags, the blanks and the
+        # characters encoded on several bytes.
+        content = PAGE.replace('words', 'wörds').encode()
+        for size in (1, 2, 3, 7, 64, len(content)):
+            with self.subTest(size=size):
+                chunks = [content[i:i + size] for i in range(0, len(content), size)]
+                minified = b''.join(minify_html_sequence(chunks, 'utf-8')).decode()
+                self.assertEqual(minified, MINIFIED.replace('words', 'wörds'))
+
+    def test_invalid_bytes(self):
+        content = b'<p>\xff</p>\n\n<p>\xfe</p>'
+        self.assertEqual(minify_html(content, 'utf-8'), b'<p>\xff</p>\n<p>\xfe</p>')
+
+
+class HTMLMinifyMiddlewareTests(SimpleTestCase):
+
+    def minify(self, response):
+        return HTMLMinifyMiddleware(lambda request: response)(RequestFactory().get('/'))
+
+    def test_response(self):
+        response = HttpResponse(PAGE)
+        response['Content-Length'] = len(response.content)
+        closed = []
+        response._resource_closers.append(lambda: closed.append(True))
+        minified = self.minify(response)
+        # The response is minified in place.
+        self.assertIs(minified, response)
+        self.assertEqual(minified.content.decode(), MINIFIED)
+        self.assertEqual(minified['Content-Length'], str(len(MINIFIED.encode())))
+        minified.close()
+        self.assertEqual(closed, [True])
+
+    def test_streaming_response(self):
+        content = PAGE.encode()
+        response = self.minify(StreamingHttpResponse(content[i:i + 5] for i in range(0, len(content), 5)))
+        self.assertEqual(b''.join(response.streaming_content).decode(), MINIFIED)
+
+    def test_other_responses(self):
+        for response in (HttpResponse(PAGE, content_type='text/plain'), HttpResponse(PAGE.encode())):
+            if response['Content-Type'].startswith('text/html'):
+                response['Content-Encoding'] = 'gzip'
+            with self.subTest(content_type=response['Content-Type']):
+                self.assertEqual(self.minify(response).content.decode(), PAGE)
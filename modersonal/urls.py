@@ -23,5 +23,6 @@ urlpatterns = [
     path('accounts/', include('users.urls')),
     path('accounts/', include('django.contrib.auth.urls')),
     path('blog/', include('blog.urls')),
+    path('internal/', include('monitoring.urls')),
     path('', TemplateView.as_view(template_name='home.html'), name='home'),
 ]
@@ -0,0 +1,78 @@
+import io
+import pstats
+
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
+
+from .models import ProfileCapture
+
+SUMMARY_FUNCTIONS = 30
+
+
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    """Administration for the profile captures, which are recorded by the
+    ProfileMiddleware only."""
+
+    list_display = ('name', 'method', 'path', 'route', 'user', 'profiler', 'status_code', 'duration_ms',
+                    'created_on', 'downloads')
+    list_select_related = ('user',)
+    list_filter = ('profiler', 'method', 'route')
+    search_fields = ('=name', 'path')
+    fields = ('name', 'method', 'path', 'route', 'user', 'profiler', 'status_code', 'duration_ms',
+              'sample_count', 'created_on', 'downloads', 'summary')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:object_id>/download/<str:kind>/', self.admin_site.admin_view(self.download),
+                 name='monitoring_profilecapture_download'),
+        ] + super(ProfileCaptureAdmin, self).get_urls()
+
+    def download(self, request, object_id, kind):
+        if not self.has_view_permission(request) or kind not in ('pstats', 'collapsed'):
+            raise Http404
+        capture = self.get_object(request, object_id)
+        if capture is None:
+            raise Http404
+        try:
+            return FileResponse(getattr(capture, '{}_path'.format(kind)).open('rb'), as_attachment=True)
+        except FileNotFoundError:
+            raise Http404
+
+    def duration_ms(self, obj):
+        return '{:.1f}'.format(obj.duration * 1000)
+
+    duration_ms.short_description = _('Duration (ms)')
+    duration_ms.admin_order_field = 'duration'
+
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">pstats</a> / <a href="{}">collapsed</a>',
+            reverse('admin:monitoring_profilecapture_download', args=[obj.pk, 'pstats']),
+            reverse('admin:monitoring_profilecapture_download', args=[obj.pk, 'collapsed']),
+        )
+
+    downloads.short_description = _('Files')
+
+    def summary(self, obj):
+        # The functions taking the most cumulative time, as printed by pstats.
+        output = io.StringIO()
+        try:
+            pstats.Stats(str(obj.pstats_path), stream=output).sort_stats('cumulative').print_stats(SUMMARY_FUNCTIONS)
+        except (OSError, EOFError, TypeError, ValueError) as e:
+            return _('The pstats file cannot be read: %s') % e
+        return format_html('<pre>{}</pre>', output.getvalue())
+
+    summary.short_description = _('Summary')
+
+
+admin.site.register(ProfileCapture, ProfileCaptureAdmin)
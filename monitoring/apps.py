@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    name = 'monitoring'
+
+    def ready(self):
+        # Connect the signal receivers of the monitoring.
+        from . import signals  # noqa: F401
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from monitoring.middleware import PROFILE_HEADER
+from monitoring.profiling import PROFILE_TOKEN_MAX_AGE, PROFILERS, SAMPLE, make_token
+
+
+class Command(BaseCommand):
+    """Print a signed token enabling the profiling of requests."""
+
+    help = (
+        'Print a signed token which, sent in the X-Profile header (MONITORING_PROFILE_HEADER), has the requests '
+        'profiled until it expires (MONITORING_PROFILE_TOKEN_MAX_AGE). The captures are listed in the admin.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiler', choices=PROFILERS, default=SAMPLE,
+            help='Profiler of the requests (default: {}).'.format(SAMPLE),
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('{}: {}'.format(PROFILE_HEADER, make_token(options['profiler'])))
+        if options['verbosity'] > 1:
+            self.stderr.write('The token expires in {} seconds.'.format(PROFILE_TOKEN_MAX_AGE))
@@ -0,0 +1,101 @@
+"""
+In-process metrics of the requests.
+
+The histograms are kept in the memory of each process, and exposed in the
+Prometheus text format. With several worker processes, each of them holds its
+own histograms, and the scraper sees the ones of the process answering it.
+"""
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+DURATION_BUCKETS = getattr(
+    settings, 'MONITORING_DURATION_BUCKETS',
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+QUERY_COUNT_BUCKETS = getattr(settings, 'MONITORING_QUERY_COUNT_BUCKETS', (0, 1, 2, 5, 10, 20, 50, 100))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    return '{{{}}}'.format(','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels))
+
+
+def _format_number(value):
+    return repr(float(value)) if not isinstance(value, int) else str(value)
+
+
+class Histogram:
+    """A Prometheus histogram, with a series per combination of labels."""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        # The value falls in the first bucket whose bound is greater than or
+        # equal to it, the cumulative counts being summed at exposition.
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.series.get(key, (None, 0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self.series[key] = counts, total + value
+
+    def expose(self):
+        with self.lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self.series.items())
+
+        lines = [
+            '# HELP {} {}'.format(self.name, self.documentation),
+            '# TYPE {} histogram'.format(self.name),
+        ]
+        for key, (counts, total) in series:
+            labels = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = bound if bound == '+Inf' else _format_number(bound)
+                lines.append('{}_bucket{} {}'.format(self.name, _format_labels(labels + [('le', le)]), cumulative))
+            lines.append('{}_sum{} {}'.format(self.name, _format_labels(labels), _format_number(total)))
+            lines.append('{}_count{} {}'.format(self.name, _format_labels(labels), cumulative))
+        return '\n'.join(lines)
+
+
+REQUEST_DURATION = Histogram(
+    'django_request_duration_seconds', 'Time spent answering the requests.',
+    ('route', 'method', 'status'), DURATION_BUCKETS,
+)
+VIEW_DURATION = Histogram(
+    'django_view_duration_seconds', 'Time spent in the views, the rendering of their templates excluded.',
+    ('route', 'method'), DURATION_BUCKETS,
+)
+RENDER_DURATION = Histogram(
+    'django_template_render_duration_seconds', 'Time spent rendering the template responses.',
+    ('route', 'method'), DURATION_BUCKETS,
+)
+QUERY_DURATION = Histogram(
+    'django_request_query_duration_seconds', 'Time spent in the SQL queries of the requests.',
+    ('route', 'method'), DURATION_BUCKETS,
+)
+QUERY_COUNT = Histogram(
+    'django_request_queries', 'Number of SQL queries of the requests.',
+    ('route', 'method'), QUERY_COUNT_BUCKETS,
+)
+
+HISTOGRAMS = (REQUEST_DURATION, VIEW_DURATION, RENDER_DURATION, QUERY_DURATION, QUERY_COUNT)
+
+
+def expose():
+    """Return the histograms in the Prometheus text format."""
+    return '\n'.join(histogram.expose() for histogram in HISTOGRAMS) + '\n'
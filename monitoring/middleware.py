@@ -0,0 +1,217 @@
+"""
+Instrumentation and profiling of the requests.
+
+The middleware times the view, the rendering of the template responses and
+the SQL queries of each request. The timings are sent in the Server-Timing
+header of the response and observed by the histograms of the route, and the
+queries slower than MONITORING_SLOW_QUERY_THRESHOLD are logged along with
+their query plan.
+
+The profiling middleware profiles single requests on demand, see
+monitoring/profiling.py.
+"""
+import logging
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError, connections, transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import ProfileCapture
+from .profiling import PROFILERS, SAMPLE, RequestProfiler, check_token
+
+SERVER_TIMING = getattr(settings, 'MONITORING_SERVER_TIMING', True)
+SLOW_QUERY_THRESHOLD = getattr(settings, 'MONITORING_SLOW_QUERY_THRESHOLD', 0.1)
+SLOW_QUERY_LOG_LIMIT = getattr(settings, 'MONITORING_SLOW_QUERY_LOG_LIMIT', 10)
+PROFILE_HEADER = getattr(settings, 'MONITORING_PROFILE_HEADER', 'X-Profile')
+PROFILE_PARAMETER = getattr(settings, 'MONITORING_PROFILE_PARAMETER', 'profile')
+
+EXPLAINED_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+UNRESOLVED_ROUTE = '<unresolved>'
+
+logger = logging.getLogger('monitoring.slow_queries')
+
+
+class QueryRecorder:
+    """Database execute wrapper counting and timing the queries, and keeping
+    the slow ones."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration >= SLOW_QUERY_THRESHOLD and not many and len(self.slow) < SLOW_QUERY_LOG_LIMIT:
+                self.slow.append((context['connection'].alias, sql, params, duration))
+
+
+class RequestTimer:
+    """Timings of a request, kept on the request as ``request.timer``."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = self.view_end = None
+        self.render_start = self.render_end = None
+        self.queries = QueryRecorder()
+
+    @property
+    def view(self):
+        if self.view_start is None:
+            return None
+        return (self.view_end or time.perf_counter()) - self.view_start
+
+    @property
+    def render(self):
+        if self.render_start is None or self.render_end is None:
+            return None
+        return self.render_end - self.render_start
+
+
+def get_route(request):
+    """Return the URL name of the request, which labels its metrics."""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNRESOLVED_ROUTE
+
+
+def explain(alias, sql, params):
+    """Return the query plan of the query, or None if it cannot be
+    explained."""
+    if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+        return None
+    connection = connections[alias]
+    try:
+        prefix = connection.ops.explain_query_prefix()
+    except NotSupportedError:
+        return None
+    # The savepoint keeps a failing EXPLAIN from breaking the transaction the
+    # request may still be in.
+    try:
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute('{} {}'.format(prefix, sql), params)
+            rows = cursor.fetchall()
+    except DatabaseError as e:
+        return 'EXPLAIN failed: {}'.format(e)
+    return '\n'.join('\t'.join(str(column) for column in row) for row in rows)
+
+
+class RequestMetricsMiddleware:
+    """Time the requests, and log their slow queries.
+
+    It is meant to be the first of the MIDDLEWARE setting, so that the time of
+    the other middleware is accounted for in the total time of the requests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.timer = timer = RequestTimer()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer.queries))
+            response = self.get_response(request)
+        if timer.view_start is not None and timer.view_end is None:
+            timer.view_end = time.perf_counter()
+        total = time.perf_counter() - timer.start
+
+        route, method = get_route(request), request.method
+        metrics.REQUEST_DURATION.observe(total, route=route, method=method, status=response.status_code)
+        metrics.QUERY_DURATION.observe(timer.queries.duration, route=route, method=method)
+        metrics.QUERY_COUNT.observe(timer.queries.count, route=route, method=method)
+        if timer.view is not None:
+            # The rendering of the template responses follows the view.
+            metrics.VIEW_DURATION.observe(timer.view, route=route, method=method)
+        if timer.render is not None:
+            metrics.RENDER_DURATION.observe(timer.render, route=route, method=method)
+
+        if SERVER_TIMING:
+            self.add_server_timing(response, timer, total)
+        for alias, sql, params, duration in timer.queries.slow:
+            logger.warning(
+                'Slow query (%.1f ms) issued by %s %s:\n%s\n%s',
+                duration * 1000, method, route, sql, explain(alias, sql, params),
+                extra={'route': route, 'duration': duration, 'sql': sql},
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timer.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Being the first middleware, this one is the last to process the
+        # template responses, right before they are rendered.
+        timer = request.timer
+        timer.view_end = timer.render_start = time.perf_counter()
+        response.add_post_render_callback(lambda response: setattr(timer, 'render_end', time.perf_counter()))
+        return response
+
+    def add_server_timing(self, response, timer, total):
+        entries = []
+        if timer.view is not None:
+            entries.append('view;dur={:.2f}'.format(timer.view * 1000))
+        if timer.render is not None:
+            entries.append('render;dur={:.2f}'.format(timer.render * 1000))
+        entries.append('sql;dur={:.2f};desc="{} queries"'.format(timer.queries.duration * 1000, timer.queries.count))
+        entries.append('total;dur={:.2f}'.format(total * 1000))
+        if response.has_header('Server-Timing'):
+            entries.insert(0, response['Server-Timing'])
+        response['Server-Timing'] = ', '.join(entries)
+
+
+class ProfileMiddleware:
+    """Profile the requests of the staff passing the ``profile`` query
+    parameter, and the requests sending a signed token in the X-Profile header
+    (see the profile_token command).
+
+    The parameter names the profiler, cprofile or sample (the default). It is
+    meant to follow the AuthenticationMiddleware, and profiles one request at a
+    time, the concurrent ones being answered without profiling.
+    """
+
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler = self.get_profiler(request)
+        if profiler is None or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            with RequestProfiler(profiler) as profile:
+                response = self.get_response(request)
+            capture = self.save(request, response, profile)
+        finally:
+            self.lock.release()
+        response['X-Profile-Capture'] = capture.name
+        return response
+
+    def get_profiler(self, request):
+        token = request.headers.get(PROFILE_HEADER)
+        if token:
+            return check_token(token)
+        profiler = request.GET.get(PROFILE_PARAMETER)
+        if profiler is not None and request.user.is_staff:
+            return profiler if profiler in PROFILERS else SAMPLE
+        return None
+
+    def save(self, request, response, profile):
+        name = '{:%Y%m%d-%H%M%S}-{}'.format(timezone.now(), uuid.uuid4().hex[:8])
+        profile.save(name)
+        return ProfileCapture.objects.create(
+            name=name, method=request.method, path=request.get_full_path()[:2000], route=get_route(request),
+            user=request.user if request.user.is_authenticated else None, profiler=profile.profiler,
+            status_code=response.status_code, duration=profile.duration, sample_count=profile.sample_count,
+        )
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .profiling import PROFILE_DIR, PROFILERS
+
+PROFILER_CHOICES = tuple((profiler, profiler) for profiler in PROFILERS)
+
+
+class ProfileCapture(models.Model):
+    """Profile of a single request, whose files are kept under
+    MONITORING_PROFILE_DIR."""
+
+    name = models.CharField(max_length=64, unique=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    route = models.CharField(max_length=200)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='+')
+    profiler = models.CharField(max_length=10, choices=PROFILER_CHOICES)
+    status_code = models.PositiveSmallIntegerField()
+    duration = models.FloatField(help_text=_('Seconds spent profiling the request.'))
+    sample_count = models.PositiveIntegerField(default=0)
+
+    @property
+    def pstats_path(self):
+        return PROFILE_DIR / '{}.pstats'.format(self.name)
+
+    @property
+    def collapsed_path(self):
+        return PROFILE_DIR / '{}.collapsed'.format(self.name)
+
+    def __str__(self):
+        return '{} {} ({})'.format(self.method, self.path, self.name)
+
+    class Meta:
+        ordering = ['-created_on']
@@ -0,0 +1,154 @@
+"""
+Profiling of single requests.
+
+A request is profiled either by cProfile or by a sampling profiler, a thread
+taking the stack of the request thread at regular intervals. The samples are
+always taken, as they give the collapsed stacks of the flame graphs, whereas
+the pstats are the ones of cProfile, or else derived from the samples.
+
+The captures are written under MONITORING_PROFILE_DIR, as NAME.pstats, to be
+loaded by pstats or snakeviz, and NAME.collapsed, to be fed to flamegraph.pl
+or speedscope.
+"""
+import cProfile
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+PROFILE_DIR = Path(getattr(settings, 'MONITORING_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+PROFILE_INTERVAL = getattr(settings, 'MONITORING_PROFILE_INTERVAL', 0.001)
+PROFILE_TOKEN_MAX_AGE = getattr(settings, 'MONITORING_PROFILE_TOKEN_MAX_AGE', 60 * 60)
+PROFILE_TOKEN_SALT = 'monitoring.profile'
+
+CPROFILE, SAMPLE = 'cprofile', 'sample'
+PROFILERS = (CPROFILE, SAMPLE)
+
+
+def make_token(profiler=SAMPLE):
+    """Return a signed token enabling the profiling of the requests sending
+    it, until it expires."""
+    return signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).sign(profiler)
+
+
+def check_token(token):
+    """Return the profiler requested by the signed token, or None if the
+    token is invalid or expired."""
+    try:
+        profiler = signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).unsign(token, max_age=PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return profiler if profiler in PROFILERS else None
+
+
+def _label(code):
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+class Sampler(threading.Thread):
+    """Thread sampling the stack of another thread."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        super(Sampler, self).__init__(name='monitoring-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while True:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                # The stacks are kept from the root to the leaf.
+                self.samples[tuple(reversed(stack))] += 1
+            if self.stopped.wait(self.interval):
+                break
+
+    def start(self):
+        # The sampler would otherwise wait for the request thread to release
+        # the GIL, every 5 ms by default, rather than sample at its interval.
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch_interval, self.interval))
+        super(Sampler, self).start()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        sys.setswitchinterval(self.switch_interval)
+
+
+def collapse(samples):
+    """Return the samples as collapsed stacks, one ``frame;frame;... count``
+    line per stack."""
+    lines = []
+    for stack, count in sorted(samples.items()):
+        frames = ';'.join('{} ({}:{})'.format(name, filename, line) for filename, line, name in stack)
+        lines.append('{} {}'.format(frames, count))
+    return '\n'.join(lines) + '\n'
+
+
+def sampled_stats(samples, interval):
+    """Return pstats statistics derived from the samples, the sample counts
+    standing in for the call counts."""
+    stats = {}
+    for stack, count in samples.items():
+        seconds = count * interval
+        # A recursive function only counts once in its cumulative time.
+        for label in set(stack):
+            cc, nc, tt, ct, callers = stats.get(label, (0, 0, 0.0, 0.0, {}))
+            stats[label] = cc + count, nc + count, tt, ct + seconds, callers
+        cc, nc, tt, ct, callers = stats[stack[-1]]
+        stats[stack[-1]] = cc, nc, tt + seconds, ct, callers
+        for caller, callee in zip(stack, stack[1:]):
+            callers = stats[callee][4]
+            callers[caller] = callers.get(caller, 0) + count
+    return stats
+
+
+class RequestProfiler:
+    """Profile the code run in its ``with`` block."""
+
+    def __init__(self, profiler=SAMPLE):
+        self.profiler = profiler
+        self.profile = cProfile.Profile() if profiler == CPROFILE else None
+        self.sampler = Sampler(threading.get_ident())
+        self.duration = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.sampler.start()
+        if self.profile is not None:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.start
+
+    @property
+    def sample_count(self):
+        return sum(self.sampler.samples.values())
+
+    def save(self, name, directory=PROFILE_DIR):
+        """Write the pstats and the collapsed stacks of the capture ``name``,
+        and return their paths."""
+        directory.mkdir(parents=True, exist_ok=True)
+        pstats_path = directory / '{}.pstats'.format(name)
+        collapsed_path = directory / '{}.collapsed'.format(name)
+        if self.profile is not None:
+            self.profile.dump_stats(str(pstats_path))
+        else:
+            pstats_path.write_bytes(marshal.dumps(sampled_stats(self.sampler.samples, self.sampler.interval)))
+        collapsed_path.write_text(collapse(self.sampler.samples))
+        return pstats_path, collapsed_path
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import ProfileCapture
+
+
+@receiver(post_delete, sender=ProfileCapture)
+def delete_capture_files(sender, instance, **kwargs):
+    """Delete the files of a deleted profile capture."""
+    for path in (instance.pstats_path, instance.collapsed_path):
+        path.unlink(missing_ok=True)
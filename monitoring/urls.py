@@ -0,0 +1,14 @@
+"""modersonal/monitoring URL Configuration
+
+The `urlpatterns` list routes URLs to views. For more information please see:
+    https://docs.djangoproject.com/en/3.1/topics/http/urls/
+"""
+from django.urls import path
+
+from . import views
+from .apps import MonitoringConfig
+
+app_name = MonitoringConfig.name
+urlpatterns = [
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+]
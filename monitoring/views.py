@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views import View
+
+from .metrics import expose
+
+
+class MetricsView(View):
+    """Expose the metrics of the process in the Prometheus text format, to
+    the INTERNAL_IPS and the staff only."""
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def get(self, request, *args, **kwargs):
+        if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS and not request.user.is_staff:
+            raise Http404
+        return HttpResponse(expose(), content_type=self.content_type)
@@ -1,11 +1,16 @@
 from django import forms
-from django.contrib.auth import get_user_model, authenticate
+from django.conf import settings
+from django.contrib.auth import get_user_model, user_login_failed
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
-from django.core.exceptions import ObjectDoesNotExist
 from django.utils.text import capfirst
 from django.utils.translation import gettext_lazy as _
 
 from .models import TblUser
+from .throttling import discount_login, throttle_login
+
+# Backend the users are logged in with, their credentials being checked by the
+# forms themselves.
+AUTHENTICATION_BACKEND = getattr(settings, 'USER_AUTHENTICATION_BACKEND', settings.AUTHENTICATION_BACKENDS[0])
 
 
 class TblUserCreationForm(UserCreationForm):
@@ -32,6 +37,7 @@ class TblAuthenticationForm(forms.Form):
         'invalid_login': _('Please enter a correct %(email)s and password. '
                            'Note that the both fields may be case-sensitive.'),
         'inactive': _('This account is inactive.'),
+        'throttled': _('Too many login attempts. Please try again in a few minutes.'),
     }
 
     def __init__(self, request=None, *args, **kwargs):
@@ -54,20 +60,25 @@ class TblAuthenticationForm(forms.Form):
         password = self.cleaned_data.get('password')
 
         if email and password:
-            self.user_cache = authenticate(email=email, password=password)
-            if self.user_cache is None:
-                # During the authentication phase, it is primordial to ensure
-                # the existence of the user in the database before raising any
-                # error if the authentication failed, to differentiate the
-                # inactive and invalid_login errors.
-                try:
-                    user_profile = TblUser.objects.get(email=email)
-                except ObjectDoesNotExist:
-                    user_profile = None
-
-                if user_profile is not None and user_profile.check_password(password):
-                    self.confirm_login_allowed(user_profile)
-
+            ip_address = self.request.META.get('REMOTE_ADDR') if self.request is not None else None
+            if throttle_login(email, ip_address):
+                raise forms.ValidationError(self.error_messages['throttled'], code='throttled')
+
+            # The credentials are checked here rather than by authenticate(),
+            # so that the password is hashed exactly once per attempt and the
+            # inactive users are told apart from the invalid logins without
+            # querying them a second time.
+            UserModel = get_user_model()
+            try:
+                user = UserModel._default_manager.get_by_natural_key(email)
+            except UserModel.DoesNotExist:
+                # A password is hashed anyway, so that the unknown emails are
+                # not told apart by the response time.
+                UserModel().set_password(password)
+                user = None
+
+            if user is None or not user.check_password(password):
+                user_login_failed.send(sender=__name__, credentials={'email': email}, request=self.request)
                 raise forms.ValidationError(
                     {'email': forms.ValidationError(
                         self.error_messages['invalid_login'],
@@ -76,8 +87,16 @@ class TblAuthenticationForm(forms.Form):
                     code='invalid_login',
                 )
 
-        if not self.cleaned_data.get('remember'):
-            self.request.session.set_expiry(0)
+            # The right password does not count against the limits.
+            discount_login(email, ip_address)
+            self.confirm_login_allowed(user)
+            user.backend = AUTHENTICATION_BACKEND
+            self.user_cache = user
+
+            # The session is only modified on a successful login, as saving the
+            # sessions of the failed attempts would fill the session store.
+            if not self.cleaned_data.get('remember'):
+                self.request.session.set_expiry(0)
 
         return self.cleaned_data
 
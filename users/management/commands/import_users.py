@@ -0,0 +1,188 @@
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import connections, transaction
+
+from users.models import FIRST_NAME_MAX_LENGTH, LAST_NAME_MAX_LENGTH, TITLES, normalize_name
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+class InvalidRecord(Exception):
+    """Raised on a record which cannot be imported."""
+
+
+class Command(BaseCommand):
+    """Import users in bulk from a CSV or JSONL file."""
+
+    help = (
+        'Stream the users of a CSV file (with a header) or a JSONL file, with the email, password, title, '
+        'first_name and last_name fields, and insert them in bulk. The passwords are hashed by a pool of '
+        'processes, and the emails already taken are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File the users are read from, - for the standard input.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Format of the file (default: jsonl for .jsonl files, csv otherwise).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of users hashed and inserted per batch (default: 1000).',
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=os.cpu_count(),
+            help='Number of hashing processes (default: the number of CPUs).',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        reader = read_jsonl if file_format == 'jsonl' else read_csv
+        self.verbosity = options['verbosity']
+        self.UserModel = get_user_model()
+        self.titles = {str(value): value for value, _ in TITLES}
+        self.titles.update((str(label), value) for value, label in TITLES)
+        self.seen = set()
+        self.imported = self.skipped = self.invalid = 0
+        self.start = time.perf_counter()
+
+        pool = None
+        if options['jobs'] > 1:
+            # The workers are spawned rather than forked, so that they do not
+            # share the database connections of this process.
+            connections.close_all()
+            context = multiprocessing.get_context('spawn')
+            pool = ProcessPoolExecutor(options['jobs'], mp_context=context, initializer=django.setup)
+
+        file = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            records = enumerate(reader(file), 1)
+            previous = None
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                users, passwords = self.prepare(batch)
+                # The passwords of the batch are hashed while the previous batch
+                # is inserted.
+                hashes = self.hash(pool, passwords, options['jobs'])
+                if previous is not None:
+                    self.insert(*previous)
+                previous = users, hashes
+            if previous is not None:
+                self.insert(*previous)
+        except (csv.Error, json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise CommandError('The file cannot be read: {}'.format(e))
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {} users, skipped {} existing and {} invalid ones in {:.1f} s.'.format(
+                self.imported, self.skipped, self.invalid, time.perf_counter() - self.start)))
+
+    def prepare(self, batch):
+        """Return the new users of the batch, and their raw passwords."""
+        users, passwords = [], []
+        for number, record in batch:
+            try:
+                user, password = self.build(record)
+            except InvalidRecord as e:
+                self.invalid += 1
+                self.stderr.write('Record {}: {}'.format(number, e))
+                continue
+            if user.email in self.seen:
+                self.skipped += 1
+                continue
+            self.seen.add(user.email)
+            users.append(user)
+            passwords.append(password)
+
+        # The emails already taken are looked up once per batch.
+        existing = set(self.UserModel._default_manager.filter(
+            email__in=[user.email for user in users]).values_list('email', flat=True))
+        if existing:
+            self.skipped += len(existing)
+            kept = [(user, password) for user, password in zip(users, passwords) if user.email not in existing]
+            users, passwords = [user for user, _ in kept], [password for _, password in kept]
+        return users, passwords
+
+    def build(self, record):
+        if not isinstance(record, dict):
+            raise InvalidRecord('not an object.')
+        email = self.UserModel._default_manager.normalize_email((record.get('email') or '').strip())
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise InvalidRecord('invalid email {!r}.'.format(email))
+        title = str(record.get('title', '')).strip()
+        if title and title not in self.titles:
+            raise InvalidRecord('invalid title {!r}.'.format(title))
+
+        # The names are normalized the way TblUser.save does, which bulk_create
+        # does not call.
+        first_name = normalize_name(str(record.get('first_name') or ''))
+        last_name = normalize_name(str(record.get('last_name') or ''))
+        if not first_name or not last_name:
+            raise InvalidRecord('missing first or last name.')
+        if len(first_name) > FIRST_NAME_MAX_LENGTH or len(last_name) > LAST_NAME_MAX_LENGTH:
+            raise InvalidRecord('first or last name too long.')
+
+        user = self.UserModel(email=email, title=self.titles.get(title, 0), first_name=first_name,
+                              last_name=last_name)
+        # The users without a password get an unusable one.
+        password = record.get('password')
+        return user, str(password) if password else None
+
+    def hash(self, pool, passwords, jobs):
+        """Hash the passwords, returning an iterator over their hashes."""
+        if pool is None:
+            return map(make_password, passwords)
+        return pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (jobs * 4)))
+
+    def insert(self, users, hashes):
+        if not users:
+            return
+        for user, password in zip(users, hashes):
+            user.password = password
+        # The emails taken in the meantime are ignored rather than failing the
+        # whole batch, hence the users inserted are counted from the emails of
+        # the batch found before and after the insertion.
+        manager = self.UserModel._default_manager
+        emails = manager.filter(email__in=[user.email for user in users])
+        with transaction.atomic(using=manager.db):
+            existing = emails.count()
+            manager.bulk_create(users, ignore_conflicts=True)
+            inserted = emails.count() - existing
+        self.imported += inserted
+        self.skipped += len(users) - inserted
+
+        elapsed = time.perf_counter() - self.start
+        if self.verbosity > 0:
+            self.stdout.write('Imported {} users ({:.0f} users/s).'.format(self.imported, self.imported / elapsed))
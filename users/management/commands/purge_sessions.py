@@ -0,0 +1,49 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    """Delete the expired sessions in chunks."""
+
+    help = (
+        'Delete the expired sessions of the database, in chunks of short transactions, so that the session '
+        'table is never locked for long. It replaces clearsessions on large tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of sessions deleted per transaction (default: 1000).',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to wait between two chunks (default: 0).',
+        )
+
+    def handle(self, *args, **options):
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(SessionStore, 'get_model_class'):
+            raise CommandError('The sessions of {} are not stored in the database.'.format(settings.SESSION_ENGINE))
+        sessions = SessionStore.get_model_class()._default_manager
+
+        # The sessions expiring during the purge are left to the next one.
+        now = timezone.now()
+        deleted = 0
+        while True:
+            with transaction.atomic(using=sessions.db):
+                keys = list(sessions.filter(expire_date__lt=now).values_list('pk', flat=True)[:options['chunk_size']])
+                if not keys:
+                    break
+                sessions.filter(pk__in=keys).delete()
+            deleted += len(keys)
+            if options['verbosity'] > 1:
+                self.stdout.write('Deleted {} sessions...'.format(deleted))
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS('Deleted {} expired sessions.'.format(deleted)))
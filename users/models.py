@@ -13,6 +13,16 @@ from .managers import TblUserManager
 TITLES = ((0, _('Prof.')), (1, _('Dr.')), (2, _('Mr.')), (3, _('Ms.')), (4, _('Mrs.')))
 FIRST_NAME_MAX_LENGTH = getattr(settings, 'USER_FIRST_NAME_MAX_LEN', 50)
 LAST_NAME_MAX_LENGTH = getattr(settings, 'USER_LAST_NAME_MAX_LEN', 50)
+REPEATED_BLANKS = re.compile(r'\s\s+')
+
+
+def normalize_name(name):
+    """Normalize a first or last name of a user:
+    1. All the excessive blank characters are removed.
+    2. All the spaces are stripped.
+    3. The cases of each field are titled.
+    """
+    return REPEATED_BLANKS.sub(' ', name.strip().title())
 
 
 class TblUser(AbstractBaseUser, PermissionsMixin):
@@ -34,12 +44,9 @@ class TblUser(AbstractBaseUser, PermissionsMixin):
 
     def save(self, *args, **kwargs):
         # Before being dumped into the database, the users fields first_name and
-        # last_name are pretreated:
-        # 1. All the excessive blank characters are removed.
-        # 2. All the spaces are stripped.
-        # 3. The cases of each field are titled.
-        self.first_name = re.sub('\s\s+', ' ', self.first_name.strip().title())
-        self.last_name = re.sub('\s\s+', ' ', self.last_name.strip().title())
+        # last_name are normalized.
+        self.first_name = normalize_name(self.first_name)
+        self.last_name = normalize_name(self.last_name)
         super(TblUser, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -1,3 +1,158 @@
-from django.test import TestCase
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .management.commands.import_users import Command as ImportUsersCommand
+from .throttling import (
+    THROTTLE_CACHE_ALIAS, THROTTLE_CLIENT_ATTEMPTS, THROTTLE_EMAIL_ATTEMPTS, THROTTLE_IP_ATTEMPTS, discount_login,
+    throttle_login,
+)
+
+
+class ThrottleTests(SimpleTestCase):
+
+    def setUp(self):
+        caches[THROTTLE_CACHE_ALIAS].clear()
+
+    def attempt(self, times, email, ip_address):
+        return [throttle_login(email, ip_address) for _ in range(times)]
+
+    def test_client(self):
+        self.assertFalse(any(self.attempt(THROTTLE_CLIENT_ATTEMPTS, 'user@example.com', '10.0.0.1')))
+        self.assertTrue(throttle_login('User@Example.com', '10.0.0.1'))
+        # The owner of the email is not locked out from another address.
+        self.assertFalse(throttle_login('user@example.com', '10.0.0.2'))
+
+    def test_email(self):
+        for i in range(THROTTLE_EMAIL_ATTEMPTS // THROTTLE_CLIENT_ATTEMPTS):
+            self.assertFalse(any(self.attempt(THROTTLE_CLIENT_ATTEMPTS, 'user@example.com', '10.0.1.{}'.format(i))))
+        self.assertTrue(throttle_login('user@example.com', '10.0.2.1'))
+
+    def test_ip_address(self):
+        for i in range(THROTTLE_IP_ATTEMPTS):
+            self.assertFalse(throttle_login('user{}@example.com'.format(i), '10.0.0.1'))
+        self.assertTrue(throttle_login('other@example.com', '10.0.0.1'))
+        self.assertFalse(throttle_login('other@example.com', '10.0.0.2'))
+
+    def test_discount(self):
+        for _ in range(3):
+            self.attempt(THROTTLE_CLIENT_ATTEMPTS - 1, 'user@example.com', '10.0.0.1')
+            self.assertFalse(throttle_login('user@example.com', '10.0.0.1'))
+            discount_login('user@example.com', '10.0.0.1')
+        # The successful attempts are discounted, and the failures before them
+        # forgotten.
+        self.assertFalse(any(self.attempt(THROTTLE_CLIENT_ATTEMPTS, 'user@example.com', '10.0.0.1')))
+        self.assertTrue(throttle_login('user@example.com', '10.0.0.1'))
+
+    def test_discount_expired(self):
+        discount_login('user@example.com', '10.0.0.1')
+        self.assertFalse(throttle_login('user@example.com', '10.0.0.1'))
+
+
+class LoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'user@example.com', 'secret-password', first_name='First', last_name='Last')
+
+    def setUp(self):
+        caches[THROTTLE_CACHE_ALIAS].clear()
+
+    def login(self, email, password, **extra):
+        """Post the login form, and return the response and the number of
+        passwords hashed."""
+        hasher = PBKDF2PasswordHasher()
+        with mock.patch.object(PBKDF2PasswordHasher, 'encode', wraps=hasher.encode) as encode:
+            response = self.client.post(reverse('users:login'), {'email': email, 'password': password}, **extra)
+        return response, encode.call_count
+
+    def test_login(self):
+        response, hashed = self.login('user@example.com', 'secret-password')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(hashed, 1)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+
+    def test_wrong_password(self):
+        response, hashed = self.login('user@example.com', 'wrong-password')
+        self.assertContains(response, 'Please enter a correct')
+        self.assertEqual(hashed, 1)
+
+    def test_unknown_email(self):
+        # A password is hashed all the same.
+        response, hashed = self.login('unknown@example.com', 'secret-password')
+        self.assertContains(response, 'Please enter a correct')
+        self.assertEqual(hashed, 1)
+
+    def test_inactive(self):
+        self.user.is_active = False
+        self.user.save()
+        response, hashed = self.login('user@example.com', 'secret-password')
+        self.assertContains(response, 'This account is inactive.')
+        self.assertEqual(hashed, 1)
+
+    def test_throttled(self):
+        for _ in range(THROTTLE_CLIENT_ATTEMPTS):
+            self.login('user@example.com', 'wrong-password')
+        response, hashed = self.login('user@example.com', 'secret-password')
+        self.assertContains(response, 'Too many login attempts.')
+        self.assertEqual(hashed, 0)
+
+        response, _ = self.login('user@example.com', 'secret-password', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 302)
+
+    def test_successes_not_counted(self):
+        for _ in range(THROTTLE_CLIENT_ATTEMPTS + 1):
+            response, _ = self.login('user@example.com', 'secret-password')
+            self.assertEqual(response.status_code, 302)
+            self.client.logout()
+
+
+class ImportUsersTests(TestCase):
+
+    def import_users(self, records):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            file.writelines(json.dumps(record) + '\n' for record in records)
+            file.flush()
+            stdout = StringIO()
+            call_command('import_users', file.name, jobs=1, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def test_import(self):
+        get_user_model().objects.create_user('taken@example.com', 'password', first_name='T', last_name='T')
+        output = self.import_users([
+            {'email': 'new@example.com', 'password': 'password', 'first_name': 'n', 'last_name': 'n'},
+            {'email': 'taken@example.com', 'first_name': 't', 'last_name': 't'},
+            {'email': 'new@example.com', 'first_name': 'n', 'last_name': 'n'},
+            {'email': 'invalid', 'first_name': 'i', 'last_name': 'i'},
+        ])
+        self.assertIn('Imported 1 users, skipped 2 existing and 1 invalid ones', output)
+        user = get_user_model().objects.get(email='new@example.com')
+        self.assertEqual(user.first_name, 'N')
+        self.assertTrue(user.check_password('password'))
+
+    def test_taken_meanwhile(self):
+        prepare = ImportUsersCommand.prepare
+
+        def prepare_and_take(command, batch):
+            users, passwords = prepare(command, batch)
+            # The email is taken between the lookup of the batch and its
+            # insertion.
+            get_user_model().objects.create_user('taken@example.com', 'password', first_name='T', last_name='T')
+            return users, passwords
+
+        with mock.patch.object(ImportUsersCommand, 'prepare', prepare_and_take):
+            output = self.import_users([
+                {'email': 'new@example.com', 'first_name': 'n', 'last_name': 'n'},
+                {'email': 'taken@example.com', 'first_name': 't', 'last_name': 't'},
+            ])
+        self.assertIn('Imported 1 users, skipped 1 existing and 0 invalid ones', output)
+        self.assertEqual(get_user_model().objects.get(email='taken@example.com').first_name, 'T')
@@ -0,0 +1,91 @@
+"""
+Rate limiting of the login attempts.
+
+The failed attempts are counted in the cache over fixed windows of
+USER_LOGIN_THROTTLE_PERIOD seconds, per email and client IP address, per client
+IP address, and per email with a looser limit, so that nobody can lock the
+owner of an email out from another address. The attempts beyond the limits are
+rejected before any password is hashed, so that the floods of credential
+stuffing cost a cache round trip rather than a key derivation.
+
+The attempts are counted before the password is checked, so that concurrent
+attempts never slip past the limits, and the successful ones are discounted
+afterwards, the failures of the client on the email being forgotten.
+
+The counters must be shared by the processes serving the logins, hence the
+USER_LOGIN_THROTTLE_CACHE_ALIAS cache should be a shared one, such as
+memcached or Redis: a local memory cache counts the attempts of each process
+apart, multiplying the limits by the number of processes.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+THROTTLE_CACHE_ALIAS = getattr(settings, 'USER_LOGIN_THROTTLE_CACHE_ALIAS', 'default')
+THROTTLE_PERIOD = getattr(settings, 'USER_LOGIN_THROTTLE_PERIOD', 5 * 60)
+THROTTLE_CLIENT_ATTEMPTS = getattr(settings, 'USER_LOGIN_THROTTLE_CLIENT_ATTEMPTS', 10)
+THROTTLE_EMAIL_ATTEMPTS = getattr(settings, 'USER_LOGIN_THROTTLE_EMAIL_ATTEMPTS', 100)
+THROTTLE_IP_ATTEMPTS = getattr(settings, 'USER_LOGIN_THROTTLE_IP_ATTEMPTS', 50)
+
+
+def _throttle_key(scope, value, window):
+    # The values are hashed, as the emails may hold characters the cache
+    # backends reject in their keys.
+    return 'users:throttle:{}:{}:{}'.format(scope, hashlib.md5(value.encode()).hexdigest(), window)
+
+
+def _counters(email, ip_address):
+    """Return the (scope, value, limit) counters of an attempt."""
+    email = email.lower()
+    counters = [('email', email, THROTTLE_EMAIL_ATTEMPTS)]
+    if ip_address:
+        counters += [
+            ('client', '{} {}'.format(ip_address, email), THROTTLE_CLIENT_ATTEMPTS),
+            ('ip', ip_address, THROTTLE_IP_ATTEMPTS),
+        ]
+    return counters
+
+
+def _window():
+    return int(time.time() // THROTTLE_PERIOD)
+
+
+def _hit(cache, key):
+    """Count an attempt, and return the number of attempts of the window."""
+    cache.add(key, 0, THROTTLE_PERIOD)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter expired in the meantime.
+        cache.set(key, 1, THROTTLE_PERIOD)
+        return 1
+
+
+def throttle_login(email, ip_address):
+    """Count a login attempt, and return whether it should be rejected."""
+    cache = caches[THROTTLE_CACHE_ALIAS]
+    window = _window()
+    # All the counters are incremented, whatever the outcome of the others.
+    throttled = False
+    for scope, value, limit in _counters(email, ip_address):
+        throttled = _hit(cache, _throttle_key(scope, value, window)) > limit or throttled
+    return throttled
+
+
+def discount_login(email, ip_address):
+    """Discount a successful login attempt, counted by throttle_login, and
+    forget the failed attempts of the client on the email."""
+    cache = caches[THROTTLE_CACHE_ALIAS]
+    window = _window()
+    for scope, value, _ in _counters(email, ip_address):
+        key = _throttle_key(scope, value, window)
+        if scope == 'client':
+            cache.delete(key)
+            continue
+        try:
+            cache.decr(key)
+        except ValueError:
+            # The attempt was counted in the previous window, or has expired.
+            pass
@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from django.contrib.auth import authenticate, login
+from django.contrib.auth import login
 from django.contrib.auth.views import LoginView
 from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
@@ -10,7 +10,7 @@ from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.debug import sensitive_post_parameters
 
-from .forms import TblUserCreationForm, TblAuthenticationForm
+from .forms import AUTHENTICATION_BACKEND, TblUserCreationForm, TblAuthenticationForm
 
 AUTHENTICATION_DIR = Path('registration')
 
@@ -43,11 +43,10 @@ class TblRegisterView(generic.CreateView):
     def form_valid(self, form):
         # If the user's registration form is valid, the user should be dump into
         # the database and be logged in.
-        form.save()
-        email = form.cleaned_data.get('email')
-        raw_password = form.cleaned_data.get('password1')
-        user = authenticate(email=email, password=raw_password)
-        login(self.request, user)
+        # The new user is logged in as is, authenticating it would hash the
+        # password a second time.
+        user = form.save()
+        login(self.request, user, backend=AUTHENTICATION_BACKEND)
         return HttpResponseRedirect(self.success_url)
 
 